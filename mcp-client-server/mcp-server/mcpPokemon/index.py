@@ -5,100 +5,2788 @@ Desarrollado con FastMCP
 """
 
 import asyncio
+import bisect
+import gzip
+import importlib.util
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from functools import partial
 import httpx
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+import numpy as np
+from typing import Optional, List, Dict, Any, Tuple, Callable, Awaitable, Iterable
 from fastmcp import FastMCP
 
 # Configuración de la API
 POKEAPI_BASE_URL = "https://pokeapi.co/api/v2"
+# Los sprites por defecto son deterministas a partir del ID del Pokémon
+POKEAPI_SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/{id}.png"
 
-# Modelos de datos
-class PokemonBasicInfo(BaseModel):
-    id: int
-    name: str
-    height: int  # en decímetros
-    weight: int  # en hectogramos
-    base_experience: int
-    types: List[str]
-    abilities: List[str]
-    sprites: Dict[str, Any]
-
-class PokemonStats(BaseModel):
-    hp: int
-    attack: int
-    defense: int
-    special_attack: int
-    special_defense: int
-    speed: int
-
-class PokemonEvolution(BaseModel):
-    species_name: str
-    min_level: Optional[int]
-    trigger: str
-    evolves_to: List[Dict[str, Any]]
+def _env_bool(name: str, default: bool) -> bool:
+    """Lee una variable de entorno booleana ("1", "true", "yes", "on")"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Configuración del cliente HTTP compartido (pool de conexiones keep-alive)
+HTTP_MAX_CONNECTIONS = int(os.getenv("POKEAPI_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("POKEAPI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("POKEAPI_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("POKEAPI_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("POKEAPI_CONNECT_TIMEOUT", "5"))
+# HTTP/2 requiere el paquete opcional "h2" (pip install "httpx[http2]")
+HTTP2_ENABLED = _env_bool("POKEAPI_HTTP2", True) and importlib.util.find_spec("h2") is not None
+
+# Decodificador JSON: orjson (en requirements.txt); si no está instalado, el de la stdlib
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+    _json_loads: Callable[[Any], Any] = orjson.loads
+else:
+    _json_loads = json.loads
+
+# Reintentos de las peticiones GET (backoff exponencial con jitter, en segundos)
+RETRY_MAX_ATTEMPTS = int(os.getenv("POKEAPI_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("POKEAPI_RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("POKEAPI_RETRY_MAX_DELAY", "2"))
+RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+# Límite global de peticiones a la PokeAPI (token bucket; 0 lo desactiva)
+RATE_LIMIT_PER_SECOND = float(os.getenv("POKEAPI_RATE_LIMIT", "20"))
+RATE_LIMIT_BURST = int(os.getenv("POKEAPI_RATE_LIMIT_BURST", "40"))
+
+# Concurrencia adaptativa (AIMD): sube de uno en uno mientras todo va bien y se
+# reduce a la mitad con 429/5xx, timeouts o latencias por encima de la tolerancia
+CONCURRENCY_INITIAL = int(os.getenv("POKEAPI_CONCURRENCY_INITIAL", "10"))
+CONCURRENCY_MIN = int(os.getenv("POKEAPI_CONCURRENCY_MIN", "2"))
+CONCURRENCY_MAX = int(os.getenv("POKEAPI_CONCURRENCY_MAX", "64"))
+CONCURRENCY_LATENCY_TOLERANCE = float(os.getenv("POKEAPI_CONCURRENCY_LATENCY_TOLERANCE", "2"))
+
+# Peticiones de cobertura (hedging): si un GET tarda más que el percentil indicado
+# de las latencias recientes se lanza un segundo GET (opcionalmente a un espejo) y
+# se usa el primero que responda. El presupuesto limita la carga extra (fracción
+# de peticiones que pueden duplicarse)
+HEDGE_ENABLED = _env_bool("POKEAPI_HEDGE", False)
+HEDGE_PERCENTILE = float(os.getenv("POKEAPI_HEDGE_PERCENTILE", "95"))
+HEDGE_BUDGET = float(os.getenv("POKEAPI_HEDGE_BUDGET", "0.05"))
+HEDGE_MIRROR_URL = os.getenv("POKEAPI_HEDGE_MIRROR_URL", "").rstrip("/")
+
+# Circuit breaker: se abre cuando la tasa de fallos de las últimas peticiones supera el umbral
+BREAKER_WINDOW = int(os.getenv("POKEAPI_BREAKER_WINDOW", "20"))
+BREAKER_MIN_REQUESTS = int(os.getenv("POKEAPI_BREAKER_MIN_REQUESTS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("POKEAPI_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_COOLDOWN = float(os.getenv("POKEAPI_BREAKER_COOLDOWN", "30"))
+
+# Configuración de la caché de respuestas en memoria (TTL en segundos)
+CACHE_MAX_ENTRIES = int(os.getenv("POKEMON_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("POKEMON_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Política de expulsión: "lru", "lfu" o "tinylfu" (W-TinyLFU)
+CACHE_POLICY = os.getenv("POKEMON_CACHE_POLICY", "lru").strip().lower()
+# Presupuestos opcionales en bytes por tipo de recurso (vacío = sin límite propio)
+CACHE_MAX_BYTES_BY_KIND = {
+    kind: int(value) for kind, value in {
+        "pokemon": os.getenv("POKEMON_CACHE_MAX_BYTES_POKEMON"),
+        "pokemon-species": os.getenv("POKEMON_CACHE_MAX_BYTES_SPECIES"),
+        "evolution-chain": os.getenv("POKEMON_CACHE_MAX_BYTES_EVOLUTION_CHAIN"),
+        "type": os.getenv("POKEMON_CACHE_MAX_BYTES_TYPE"),
+        "move": os.getenv("POKEMON_CACHE_MAX_BYTES_MOVE"),
+    }.items() if value
+}
+CACHE_DEFAULT_TTL = float(os.getenv("POKEMON_CACHE_TTL", "3600"))
+CACHE_TTL_BY_KIND = {
+    "pokemon": float(os.getenv("POKEMON_CACHE_TTL_POKEMON", "86400")),
+    "pokemon-species": float(os.getenv("POKEMON_CACHE_TTL_SPECIES", "86400")),
+    "evolution-chain": float(os.getenv("POKEMON_CACHE_TTL_EVOLUTION_CHAIN", "604800")),
+    "type": float(os.getenv("POKEMON_CACHE_TTL_TYPE", "86400")),
+    "move": float(os.getenv("POKEMON_CACHE_TTL_MOVE", "604800")),
+}
+# Tiempo tras expirar durante el que una entrada se sirve caducada mientras se
+# revalida en segundo plano (stale-while-revalidate); 0 lo desactiva
+CACHE_STALE_TTL = float(os.getenv("POKEMON_CACHE_STALE_TTL", "86400"))
+
+# Caché negativa de recursos no encontrados (404): TTL corto y tamaño acotado
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("POKEMON_NEGATIVE_CACHE_MAX_ENTRIES", "2000"))
+NEGATIVE_CACHE_TTL = float(os.getenv("POKEMON_NEGATIVE_CACHE_TTL", "300"))
+NEGATIVE_CACHE_TTL_BY_KIND = {
+    "type": float(os.getenv("POKEMON_NEGATIVE_CACHE_TTL_TYPE", "3600")),
+}
+
+# Peticiones en paralelo por llamada (fan-out) y plazo máximo por llamada en segundos
+FANOUT_CONCURRENCY = int(os.getenv("POKEMON_FANOUT_CONCURRENCY", "10"))
+FANOUT_TIMEOUT = float(os.getenv("POKEMON_FANOUT_TIMEOUT", "8"))
+# Máximo de Pokémon que una sola llamada puede pedir (por encima se devuelve un error)
+FANOUT_MAX_ITEMS = int(os.getenv("POKEMON_FANOUT_MAX_ITEMS", "50"))
+
+# Reserva de Pokémon aleatorios ya preparados (0 la desactiva)
+RANDOM_POOL_SIZE = int(os.getenv("POKEMON_RANDOM_POOL_SIZE", "8"))
+
+# Caché persistente opcional en SQLite (vacío = desactivada)
+CACHE_DB_PATH = os.getenv("POKEMON_CACHE_DB", "")
+CACHE_DB_MAX_BYTES = int(os.getenv("POKEMON_CACHE_DB_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Snapshot local de la PokeAPI (vacío = desactivado) y uso de la red cuando falta un recurso
+SNAPSHOT_PATH = os.getenv("POKEMON_SNAPSHOT", "")
+SNAPSHOT_NETWORK_FALLBACK = _env_bool("POKEMON_SNAPSHOT_NETWORK_FALLBACK", True)
+
+# Estadísticas base en el orden de la PokeAPI
+STAT_NAMES = ("hp", "attack", "defense", "special_attack", "special_defense", "speed")
+
+class PokeAPIError(Exception):
+    """Respuesta inesperada de la PokeAPI (5xx, 429...), distinta de un 404"""
+
+    def __init__(self, status_code: int, url: str):
+        super().__init__(f"La PokeAPI respondió {status_code} para {url}")
+        self.status_code = status_code
+        self.url = url
+
+class CircuitOpenError(Exception):
+    """El circuit breaker está abierto: no se contacta con la PokeAPI"""
+
+    def __init__(self, url: str):
+        super().__init__(f"La PokeAPI no está disponible temporalmente (circuito abierto) para {url}")
+        self.url = url
+
+class IndexBuildingError(Exception):
+    """El índice que necesita la herramienta todavía se está construyendo en segundo plano"""
+
+# Registros compactos de las entidades que se guardan en memoria: usan
+# __slots__ (sin __dict__ por instancia), internan los nombres que se repiten
+# (tipos, habilidades) y guardan las estadísticas en un array de enteros. Solo
+# se convierten en diccionario en el borde de las herramientas (to_dict)
+class PokemonRecord:
+    """Datos básicos de un Pokémon (lo que devuelve get_pokemon_info)"""
+
+    __slots__ = ("id", "name", "height", "weight", "base_experience", "types", "abilities", "stats", "sprites")
+    SPRITE_FIELDS = ("front_default", "front_shiny", "back_default", "back_shiny")
+
+    def __init__(self, id: int, name: str, height: int, weight: int, base_experience: Optional[int],
+                 types: Tuple[str, ...], abilities: Tuple[str, ...], stats: array,
+                 sprites: Tuple[Optional[str], ...]):
+        self.id = id
+        self.name = name
+        self.height = height  # en decímetros
+        self.weight = weight  # en hectogramos
+        self.base_experience = base_experience
+        self.types = types
+        self.abilities = abilities
+        self.stats = stats  # en el orden de STAT_NAMES
+        self.sprites = sprites  # en el orden de SPRITE_FIELDS
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "PokemonRecord":
+        """Construye el registro a partir de una respuesta de /pokemon (o del snapshot)"""
+        stats = {stat["stat"]["name"].replace("-", "_"): stat["base_stat"] for stat in data["stats"]}
+        sprites = data.get("sprites") or {}
+        return cls(
+            data["id"],
+            sys.intern(data["name"]),
+            data["height"],
+            data["weight"],
+            data.get("base_experience"),
+            tuple(sys.intern(type_info["type"]["name"]) for type_info in data["types"]),
+            tuple(sys.intern(ability_info["ability"]["name"]) for ability_info in data["abilities"]),
+            array("H", [stats.get(stat_name, 0) for stat_name in STAT_NAMES]),
+            tuple(sprites.get(field) for field in cls.SPRITE_FIELDS),
+        )
+
+    def retained_size(self) -> int:
+        """Bytes aproximados que ocupa el registro (los nombres internados no se cuentan)"""
+        return (sys.getsizeof(self) + sys.getsizeof(self.name) + sys.getsizeof(self.types)
+                + sys.getsizeof(self.abilities) + sys.getsizeof(self.stats) + sys.getsizeof(self.sprites)
+                + sum(sys.getsizeof(sprite) for sprite in self.sprites if sprite))
+
+    def to_json(self) -> List[Any]:
+        """Forma compacta serializable (para la caché persistente)"""
+        return [self.id, self.name, self.height, self.weight, self.base_experience,
+                list(self.types), list(self.abilities), self.stats.tolist(), list(self.sprites)]
+
+    @classmethod
+    def from_json(cls, data: List[Any]) -> "PokemonRecord":
+        id, name, height, weight, base_experience, types, abilities, stats, sprites = data
+        return cls(id, sys.intern(name), height, weight, base_experience,
+                   tuple(map(sys.intern, types)), tuple(map(sys.intern, abilities)),
+                   array("H", stats), tuple(sprites))
+
+    def to_dict(self, fields: Optional["FieldSelection"] = None) -> Dict[str, Any]:
+        """Forma que devuelven las herramientas; con `fields` solo se construyen esos campos"""
+        if fields is not None:
+            return {field: self._field(field, subfields) for field, subfields in fields.items()}
+        return {
+            "id": self.id,
+            "name": self.name.title(),
+            "height": self.height / 10,  # Convertir a metros
+            "weight": self.weight / 10,  # Convertir a kg
+            "base_experience": self.base_experience,
+            "types": list(self.types),
+            "abilities": list(self.abilities),
+            "stats": dict(zip(STAT_NAMES, self.stats)),
+            "sprites": dict(zip(self.SPRITE_FIELDS, self.sprites)),
+        }
+
+    def _field(self, field: str, subfields: Optional[Tuple[str, ...]]) -> Any:
+        if field == "name":
+            return self.name.title()
+        if field in ("height", "weight"):
+            return getattr(self, field) / 10
+        if field in ("types", "abilities"):
+            return list(getattr(self, field))
+        if field == "stats":
+            return {stat: self.stats[STAT_NAMES.index(stat)] for stat in subfields or STAT_NAMES}
+        if field == "sprites":
+            return {sprite: self.sprites[self.SPRITE_FIELDS.index(sprite)] for sprite in subfields or self.SPRITE_FIELDS}
+        return getattr(self, field)
+
+# Campos pedidos por las herramientas con `fields`: campo -> subcampos
+# (None = el campo completo). Ej: {"name": None, "stats": ("speed",)}
+FieldSelection = Dict[str, Optional[Tuple[str, ...]]]
+
+def _parse_fields(fields: Optional[Any], allowed: Iterable[str],
+                  subfields: Optional[Dict[str, Tuple[str, ...]]] = None) -> Optional[FieldSelection]:
+    """
+    Normaliza el parámetro `fields` de una herramienta: acepta una lista o una
+    cadena separada por comas, y "campo.subcampo" (ej: "stats.speed") en los
+    campos que lo admiten. Devuelve None si no se pidió ninguna selección.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    allowed = tuple(allowed)
+    subfields = subfields or {}
+    selection: FieldSelection = {}
+    for raw in fields:
+        field, _, sub = str(raw).strip().lower().replace("-", "_").partition(".")
+        if not field:
+            continue
+        if field not in allowed:
+            raise ValueError(f"Campo '{raw}' no válido. Opciones: {', '.join(allowed)}")
+        if not sub:
+            selection[field] = None
+            continue
+        if sub not in subfields.get(field, ()):
+            raise ValueError(f"Campo '{raw}' no válido. Opciones de {field}: {', '.join(subfields.get(field, ()))}")
+        if field not in selection or selection[field] is not None:
+            selection[field] = (selection.get(field) or ()) + (sub,)
+    return selection or None
+
+POKEMON_FIELDS = PokemonRecord.__slots__
+POKEMON_SUBFIELDS = {"stats": STAT_NAMES, "sprites": PokemonRecord.SPRITE_FIELDS}
+
+class MoveRecord:
+    """Potencia, precisión, PP, prioridad, tipo y clase de daño de un movimiento"""
+
+    __slots__ = ("power", "accuracy", "pp", "priority", "type", "damage_class")
+
+    def __init__(self, power: Optional[int], accuracy: Optional[int], pp: Optional[int],
+                 priority: Optional[int], type: Optional[str], damage_class: Optional[str]):
+        self.power = power
+        self.accuracy = accuracy
+        self.pp = pp
+        self.priority = priority
+        self.type = type
+        self.damage_class = damage_class
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "MoveRecord":
+        """Construye el registro a partir de una respuesta de /move"""
+        type_name = (data.get("type") or {}).get("name")
+        damage_class = (data.get("damage_class") or {}).get("name")
+        return cls(
+            data.get("power"),
+            data.get("accuracy"),
+            data.get("pp"),
+            data.get("priority"),
+            sys.intern(type_name) if type_name else None,
+            sys.intern(damage_class) if damage_class else None,
+        )
+
+    def retained_size(self) -> int:
+        return sys.getsizeof(self)
+
+    def to_json(self) -> List[Any]:
+        return [getattr(self, field) for field in self.__slots__]
+
+    @classmethod
+    def from_json(cls, data: List[Any]) -> "MoveRecord":
+        power, accuracy, pp, priority, type_name, damage_class = data
+        return cls(power, accuracy, pp, priority,
+                   sys.intern(type_name) if type_name else None,
+                   sys.intern(damage_class) if damage_class else None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+# Cliente HTTP único durante la vida del servidor
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _create_http_client() -> httpx.AsyncClient:
+    """Crea el cliente HTTP con pool de conexiones, keep-alive y HTTP/2"""
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        headers={"User-Agent": "pokemon-mcp-server"},
+    )
+
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente HTTP compartido.
+
+    Normalmente lo crea el lifespan de FastMCP; si las funciones se usan fuera
+    del servidor (scripts de prueba) se crea bajo demanda.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+# Ruta base de la API (ej: "/api/v2") para clasificar las URLs por tipo de recurso
+_API_PATH = httpx.URL(POKEAPI_BASE_URL).path.rstrip("/")
+
+def _resource_path(url: str) -> List[str]:
+    """Divide la ruta de una URL de la PokeAPI en segmentos (ej: ["pokemon", "25"])"""
+    path = httpx.URL(url).path
+    if path.startswith(_API_PATH):
+        path = path[len(_API_PATH):]
+    return [segment for segment in path.split("/") if segment]
+
+def _resource_kind(url: str) -> str:
+    """Tipo de recurso de una URL: "pokemon", "pokemon-species", "type", ..."""
+    segments = _resource_path(url)
+    return segments[0] if segments else ""
+
+def _id_from_url(url: str) -> Optional[int]:
+    """Extrae el ID numérico de una URL de recurso (ej: ".../pokemon/25/" -> 25)"""
+    segments = _resource_path(url)
+    if len(segments) >= 2 and segments[1].isdigit():
+        return int(segments[1])
+    return None
+
+def _cache_key(url: str, projection: Optional[str] = None) -> str:
+    """
+    Normaliza una URL para usarla como clave de caché (sin "/" final). Las
+    proyecciones se cachean aparte: la clave lleva su nombre ("...#nombre").
+    """
+    parsed = httpx.URL(url)
+    key = str(parsed.copy_with(path=parsed.path.rstrip("/") or "/"))
+    return f"{key}#{projection}" if projection else key
+
+# Proyecciones: el registro compacto en el que se convierte un recurso para
+# algunas herramientas. La respuesta se reduce nada más decodificarla y solo se
+# cachea el registro, que en /pokemon ocupa una fracción mínima del cuerpo
+# (moves, game_indices y los sprites de todas las versiones se descartan)
+PROJECTIONS: Dict[str, Any] = {
+    "pokemon-summary": PokemonRecord,
+    "move-details": MoveRecord,
+}
+
+def _project(data: Dict[str, Any], projection: str) -> Any:
+    """Convierte un recurso en el registro de la proyección indicada"""
+    return PROJECTIONS[projection].from_payload(data)
+
+def _stored_value(value: Any, projection: Optional[str]) -> Any:
+    """Valor tal y como se lee de la caché persistente (los registros se guardan con to_json)"""
+    return PROJECTIONS[projection].from_json(value) if projection else value
+
+# Validadores de una respuesta para revalidarla con una petición condicional
+Validators = Tuple[Optional[str], Optional[str]]
+
+# Un JSON decodificado ocupa en memoria unas 4 veces lo que su texto (medido
+# con tracemalloc sobre respuestas de /pokemon); recorrer el objeto para medirlo
+# exactamente costaría más que decodificarlo
+JSON_MEMORY_FACTOR = 4
+
+def _retained_size(value: Any, json_bytes: int) -> int:
+    """Tamaño aproximado en memoria de un valor cacheado a partir de su JSON"""
+    if isinstance(value, (PokemonRecord, MoveRecord)):
+        return value.retained_size()
+    return json_bytes * JSON_MEMORY_FACTOR
+
+class EvictionPolicy(ABC):
+    """
+    Orden de expulsión de las claves de un tipo de recurso.
+
+    La caché avisa de cada inserción, acceso y borrado, y pide una víctima
+    (evict) mientras se supere algún presupuesto.
+    """
+
+    @abstractmethod
+    def insert(self, key: str, size: int) -> None: ...
+
+    @abstractmethod
+    def access(self, key: str) -> None: ...
+
+    @abstractmethod
+    def remove(self, key: str) -> None: ...
+
+    @abstractmethod
+    def evict(self) -> Optional[str]:
+        """Elige una víctima, la olvida y la devuelve (None si no hay claves)"""
+
+    @abstractmethod
+    def keys(self) -> Iterable[str]:
+        """Claves que sigue la política (deben coincidir con las de la caché)"""
+
+class LRUPolicy(EvictionPolicy):
+    """Expulsa la clave usada hace más tiempo"""
+
+    def __init__(self, capacity: int, max_entries: int):
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+
+    def insert(self, key: str, size: int) -> None:
+        self._order[key] = None
+
+    def access(self, key: str) -> None:
+        self._order.move_to_end(key)
+
+    def remove(self, key: str) -> None:
+        self._order.pop(key, None)
+
+    def evict(self) -> Optional[str]:
+        if not self._order:
+            return None
+        return self._order.popitem(last=False)[0]
+
+    def keys(self) -> Iterable[str]:
+        return self._order.keys()
+
+class LFUPolicy(EvictionPolicy):
+    """Expulsa la clave con menos accesos (en empate, la usada hace más tiempo), en O(1)"""
+
+    def __init__(self, capacity: int, max_entries: int):
+        self._frequency: Dict[str, int] = {}
+        self._buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_frequency = 0
+
+    def _move(self, key: str, frequency: int) -> None:
+        bucket = self._buckets.setdefault(frequency, OrderedDict())
+        bucket[key] = None
+        self._frequency[key] = frequency
+
+    def _unlink(self, key: str) -> int:
+        frequency = self._frequency.pop(key)
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[frequency]
+        return frequency
+
+    def insert(self, key: str, size: int) -> None:
+        self._move(key, 1)
+        self._min_frequency = 1
+
+    def access(self, key: str) -> None:
+        frequency = self._unlink(key)
+        if frequency == self._min_frequency and frequency not in self._buckets:
+            self._min_frequency = frequency + 1
+        self._move(key, frequency + 1)
+
+    def remove(self, key: str) -> None:
+        if key in self._frequency:
+            self._unlink(key)
+
+    def evict(self) -> Optional[str]:
+        if not self._frequency:
+            return None
+        if self._min_frequency not in self._buckets:
+            self._min_frequency = min(self._buckets)
+        key = next(iter(self._buckets[self._min_frequency]))
+        self._unlink(key)
+        return key
+
+    def keys(self) -> Iterable[str]:
+        return self._frequency.keys()
+
+class FrequencySketch:
+    """
+    Count-Min Sketch de 4 filas con contadores de 4 bits (tope 15) para
+    estimar la frecuencia reciente de las claves. Tras 10 * width incrementos
+    todos los contadores se dividen entre dos, de modo que lo antiguo pierde peso.
+    """
+
+    SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x85EBCA77C2B2AE63)
+
+    def __init__(self, width: int):
+        self.width = 1 << max(4, (max(1, width) - 1).bit_length())
+        self._mask = self.width - 1
+        self._rows = [bytearray(self.width) for _ in self.SEEDS]
+        self._additions = 0
+        self._sample_size = 10 * self.width
+
+    def _indexes(self, key: str) -> List[int]:
+        hashed = hash(key)
+        return [((hashed * seed) >> 32) & self._mask for seed in self.SEEDS]
+
+    def increment(self, key: str) -> None:
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < 15:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._rows = [bytearray(count >> 1 for count in row) for row in self._rows]
+            self._additions //= 2
+
+    def frequency(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+class TinyLFUPolicy(EvictionPolicy):
+    """
+    W-TinyLFU: las claves nuevas entran en una ventana LRU pequeña (1% de los
+    bytes); al salir de ella pasan a ser candidatas y, cuando hace falta sitio,
+    compiten con la víctima de la zona principal (SLRU: periodo de prueba +
+    protegida): solo se quedan si el sketch de frecuencias dice que se usan
+    más. Resiste los recorridos de un solo uso (p. ej. construir un índice
+    recorriendo todo /pokemon) sin vaciar la caché.
+    """
+
+    WINDOW_RATIO = 0.01
+    PROTECTED_RATIO = 0.8
+
+    def __init__(self, capacity: int, max_entries: int):
+        self._window: "OrderedDict[str, int]" = OrderedDict()
+        self._candidates: "OrderedDict[str, int]" = OrderedDict()
+        self._probation: "OrderedDict[str, int]" = OrderedDict()
+        self._protected: "OrderedDict[str, int]" = OrderedDict()
+        self._window_bytes = 0
+        self._protected_bytes = 0
+        self.window_capacity = max(1, int(capacity * self.WINDOW_RATIO))
+        self.protected_capacity = int((capacity - self.window_capacity) * self.PROTECTED_RATIO)
+        self.sketch = FrequencySketch(max_entries)
+
+    def insert(self, key: str, size: int) -> None:
+        self.sketch.increment(key)
+        self._window[key] = size
+        self._window_bytes += size
+        while self._window_bytes > self.window_capacity and len(self._window) > 1:
+            candidate, candidate_size = self._window.popitem(last=False)
+            self._window_bytes -= candidate_size
+            self._candidates[candidate] = candidate_size
+
+    def access(self, key: str) -> None:
+        self.sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._candidates or key in self._probation:
+            size = self._candidates.pop(key, None)
+            if size is None:
+                size = self._probation.pop(key)
+            self._protected[key] = size
+            self._protected_bytes += size
+            # La zona protegida llena devuelve sus claves más antiguas a prueba
+            while self._protected_bytes > self.protected_capacity and len(self._protected) > 1:
+                demoted, demoted_size = self._protected.popitem(last=False)
+                self._protected_bytes -= demoted_size
+                self._probation[demoted] = demoted_size
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+
+    def remove(self, key: str) -> None:
+        if key in self._window:
+            self._window_bytes -= self._window.pop(key)
+        elif key in self._protected:
+            self._protected_bytes -= self._protected.pop(key)
+        else:
+            self._candidates.pop(key, None)
+            self._probation.pop(key, None)
+
+    def evict(self) -> Optional[str]:
+        if self._candidates:
+            candidate, size = self._candidates.popitem(last=False)
+            victim = next(iter(self._probation), None) or next(iter(self._protected), None)
+            if victim is None:
+                return candidate
+            if self.sketch.frequency(candidate) > self.sketch.frequency(victim):
+                self.remove(victim)
+                self._probation[candidate] = size
+                return victim
+            return candidate
+        for segment in (self._probation, self._protected, self._window):
+            if segment:
+                key = next(iter(segment))
+                self.remove(key)
+                return key
+        return None
+
+    def keys(self) -> Iterable[str]:
+        return [*self._window, *self._candidates, *self._probation, *self._protected]
+
+EVICTION_POLICIES = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "tinylfu": TinyLFUPolicy,
+    "w-tinylfu": TinyLFUPolicy,
+}
+
+class ResponseCache:
+    """
+    Caché en memoria para respuestas de la PokeAPI, con presupuesto de bytes.
+
+    Cada entrada expira según el TTL de su tipo de recurso y lleva su tamaño
+    aproximado en memoria. La caché respeta un máximo de entradas, un
+    presupuesto global de bytes y, opcionalmente, un presupuesto por tipo de
+    recurso. Cada tipo tiene su propia política de expulsión (LRU, LFU o
+    W-TinyLFU); con presión global se expulsa del tipo que más bytes ocupa.
+    Las operaciones no ceden el control al event loop, así que no necesitan
+    locks.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int,
+                 ttl_by_kind: Dict[str, float], default_ttl: float,
+                 policy: str = "lru", max_bytes_by_kind: Optional[Dict[str, int]] = None):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Política de caché '{policy}' no válida. Opciones: {', '.join(EVICTION_POLICIES)}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_by_kind = ttl_by_kind
+        self.default_ttl = default_ttl
+        self.policy = policy
+        self.max_bytes_by_kind = max_bytes_by_kind or {}
+        # clave -> (expira_en, tamaño, valor, validadores (ETag, Last-Modified), tipo)
+        self._entries: Dict[str, Tuple[float, int, Any, Validators, str]] = {}
+        self._policies: Dict[str, EvictionPolicy] = {}
+        self._bytes = 0
+        self._bytes_by_kind: Dict[str, int] = {}
+        self._entries_by_kind: Dict[str, int] = {}
+        self._evictions_by_kind: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def ttl_for(self, kind: str) -> float:
+        return self.ttl_by_kind.get(kind, self.default_ttl)
+
+    def _policy_for(self, kind: str) -> EvictionPolicy:
+        policy = self._policies.get(kind)
+        if policy is None:
+            capacity = self.max_bytes_by_kind.get(kind, self.max_bytes)
+            policy = self._policies[kind] = EVICTION_POLICIES[self.policy](capacity, self.max_entries)
+        return policy
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Devuelve el valor si existe y no ha expirado (None en otro caso). Las
+        entradas expiradas se conservan hasta que la política las expulsa, por
+        si hay que servirlas caducadas (ver get_stale).
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._policies[entry[4]].access(key)
+        self.hits += 1
+        return entry[2]
+
+    def get_stale(self, key: str, max_stale: float = float("inf")) -> Optional[Any]:
+        """
+        Devuelve el valor aunque haya expirado, siempre que no lleve más de
+        max_stale segundos caducado (None si no está o es demasiado antiguo)
+        """
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > max_stale:
+            return None
+        self.stale_hits += 1
+        return entry[2]
+
+    def entry(self, key: str) -> Optional[Tuple[int, Any, Validators]]:
+        """(tamaño, valor, validadores) de una entrada, vigente o no, sin contar como acceso"""
+        entry = self._entries.get(key)
+        return entry[1:4] if entry is not None else None
+
+    def set(self, key: str, value: Any, size: int, kind: str, ttl: Optional[float] = None,
+            validators: Validators = (None, None)) -> None:
+        """Guarda un valor y expulsa entradas según la política si se supera algún límite"""
+        if size > self.max_bytes_by_kind.get(kind, self.max_bytes):
+            return
+        if key in self._entries:
+            self._remove(key)
+        ttl = self.ttl_for(kind) if ttl is None else ttl
+        self._entries[key] = (time.monotonic() + ttl, size, value, validators, kind)
+        self._bytes += size
+        self._bytes_by_kind[kind] = self._bytes_by_kind.get(kind, 0) + size
+        self._entries_by_kind[kind] = self._entries_by_kind.get(kind, 0) + 1
+        self._policy_for(kind).insert(key, size)
+
+        kind_budget = self.max_bytes_by_kind.get(kind)
+        while kind_budget is not None and self._bytes_by_kind[kind] > kind_budget:
+            self._evict_from(kind)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            # Presión global: expulsar del tipo que más ocupa
+            self._evict_from(max(self._bytes_by_kind, key=lambda k: (self._bytes_by_kind[k], self._entries_by_kind[k])))
+
+    def _evict_from(self, kind: str) -> None:
+        victim = self._policies[kind].evict()
+        if victim is None:
+            return
+        self._remove(victim, notify_policy=False)
+        self.evictions += 1
+        self._evictions_by_kind[kind] = self._evictions_by_kind.get(kind, 0) + 1
+
+    def discard(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: str, notify_policy: bool = True) -> None:
+        _, size, _, _, kind = self._entries.pop(key)
+        self._bytes -= size
+        self._bytes_by_kind[kind] -= size
+        self._entries_by_kind[kind] -= 1
+        if not self._entries_by_kind[kind]:
+            del self._entries_by_kind[kind]
+            del self._bytes_by_kind[kind]
+        if notify_policy:
+            self._policies[kind].remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._policies.clear()
+        self._bytes = 0
+        self._bytes_by_kind.clear()
+        self._entries_by_kind.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        kinds = sorted(set(self._entries_by_kind) | set(self._evictions_by_kind) | set(self.max_bytes_by_kind))
+        return {
+            "policy": self.policy,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "occupancy": round(self._bytes / self.max_bytes, 4) if self.max_bytes else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "by_kind": {
+                kind: {
+                    "entries": self._entries_by_kind.get(kind, 0),
+                    "bytes": self._bytes_by_kind.get(kind, 0),
+                    "max_bytes": self.max_bytes_by_kind.get(kind),
+                    "evictions": self._evictions_by_kind.get(kind, 0),
+                }
+                for kind in kinds
+            },
+        }
+
+class SQLiteCache:
+    """
+    Caché persistente de respuestas en SQLite (modo WAL).
+
+    Guarda el JSON ya parseado de cada URL junto con la hora de descarga, de
+    modo que un reinicio del servidor arranca con la caché caliente. Varios
+    procesos pueden compartir el mismo fichero: WAL permite lectores
+    concurrentes y las escrituras usan transacciones IMMEDIATE con busy_timeout.
+    Las llamadas son bloqueantes; desde el event loop se usan con
+    asyncio.to_thread.
+    """
+
+    # Solo se actualiza accessed_at si la lectura anterior es más antigua que esto
+    ACCESS_UPDATE_INTERVAL = 60.0
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " url TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT)"
+            )
+            # Ficheros creados por versiones anteriores, sin columnas de validadores
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            for column in ("etag", "last_modified"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._create_size_counter(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _create_size_counter(conn: sqlite3.Connection) -> None:
+        """
+        Mantiene el total de bytes en una tabla de una fila, actualizada por
+        triggers en la misma transacción que cada escritura (también la de
+        otros procesos), para no sumar toda la tabla en cada set(). Los
+        ficheros existentes se cuentan una vez al crear la tabla.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_meta ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total_size INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses BEGIN"
+                " UPDATE cache_meta SET total_size = total_size + NEW.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses BEGIN"
+                " UPDATE cache_meta SET total_size = total_size - OLD.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses BEGIN"
+                " UPDATE cache_meta SET total_size = total_size + NEW.size - OLD.size WHERE id = 0; END"
+            )
+            if conn.execute("SELECT 1 FROM cache_meta WHERE id = 0").fetchone() is None:
+                conn.execute(
+                    "INSERT INTO cache_meta (id, total_size)"
+                    " SELECT 0, COALESCE(SUM(size), 0) FROM responses"
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key: str, ttl: float,
+            max_stale: float = 0.0) -> Optional[Tuple[Any, int, float, Validators]]:
+        """
+        Devuelve (valor, tamaño, fetched_at, validadores) si la entrada existe y
+        sigue vigente o no lleva más de max_stale segundos caducada
+        """
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT payload, size, fetched_at, accessed_at, etag, last_modified"
+                    " FROM responses WHERE url = ?", (key,)
+                ).fetchone()
+                now = time.time()
+                if row is None or row[2] + ttl + max_stale <= now:
+                    self.misses += 1
+                    return None
+                if now - row[3] > self.ACCESS_UPDATE_INTERVAL:
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, key))
+                if row[2] + ttl > now:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                return _json_loads(row[0]), row[1], row[2], (row[4], row[5])
+            except sqlite3.Error:
+                self.errors += 1
+                return None
+
+    def set(self, key: str, value: Any, fetched_at: float, validators: Validators = (None, None)) -> None:
+        """Guarda una respuesta y expulsa las menos usadas si se supera max_bytes"""
+        payload = json.dumps(value, separators=(",", ":"))
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Upsert en lugar de INSERT OR REPLACE: el borrado implícito de
+                    # REPLACE no dispara los triggers que llevan el total de bytes
+                    conn.execute(
+                        "INSERT INTO responses"
+                        " (url, payload, size, fetched_at, accessed_at, etag, last_modified)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (url) DO UPDATE SET payload = excluded.payload, size = excluded.size,"
+                        " fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at,"
+                        " etag = excluded.etag, last_modified = excluded.last_modified",
+                        (key, payload, size, fetched_at, time.time(), *validators),
+                    )
+                    self._evict(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                self.writes += 1
+            except sqlite3.Error:
+                self.errors += 1
+
+    def touch(self, key: str, fetched_at: float) -> None:
+        """Marca una entrada como descargada de nuevo (revalidada con un 304)"""
+        with self._lock:
+            try:
+                self._connection().execute(
+                    "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                    (fetched_at, time.time(), key),
+                )
+            except sqlite3.Error:
+                self.errors += 1
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Borra las entradas con acceso más antiguo hasta quedar bajo el presupuesto"""
+        total = conn.execute("SELECT total_size FROM cache_meta WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for url, size in conn.execute("SELECT url, size FROM responses ORDER BY accessed_at"):
+            victims.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE url = ?", victims)
+        self.evictions += len(victims)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                entries, total = self._connection().execute(
+                    "SELECT COUNT(*), (SELECT total_size FROM cache_meta WHERE id = 0) FROM responses"
+                ).fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                entries, total = None, None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+
+    El primer llamante lanza la tarea y el resto espera su resultado (o su
+    excepción). La tarea se protege con asyncio.shield para que cancelar a un
+    llamante no cancele la petición compartida.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._done, key))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def running(self, key: str) -> Optional[asyncio.Future]:
+        """Tarea en curso para la clave (None si no hay ninguna)"""
+        return self._calls.get(key)
+
+    def _done(self, key: str, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Marcar la excepción como recuperada aunque todos los llamantes se hayan cancelado
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+class RetryPolicy:
+    """
+    Reintentos con backoff exponencial y jitter completo: antes del intento n
+    se espera un tiempo aleatorio entre 0 y min(max_delay, base_delay * 2**n),
+    o lo que indique la cabecera Retry-After (limitado a max_delay).
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.exhausted = 0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_attempts": self.max_attempts,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+class TokenBucket:
+    """
+    Limitador de ritmo token bucket compartido por todas las peticiones.
+
+    Se reponen `rate` tokens por segundo hasta un máximo de `burst`; cada
+    petición consume uno. Los que esperan se atienden en orden de llegada.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.throttled = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        self.waiting += 1
+        try:
+            async with self._lock:
+                self._refill()
+                if self._tokens < 1:
+                    self.throttled += 1
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= 1
+        finally:
+            self.waiting -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        if self.rate > 0:
+            self._refill()
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+        }
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Límite de peticiones simultáneas ajustado con AIMD.
+
+    Cada respuesta sana suma 1/limit (aproximadamente +1 por ronda de
+    peticiones); una sobrecarga (429/5xx, timeout) o una latencia mayor que
+    `latency_tolerance` veces la mínima reciente del mismo tipo de recurso (y
+    de al menos LATENCY_FLOOR segundos, para ignorar el ruido de respuestas
+    muy rápidas) multiplica el límite por 0.5, como mucho una vez por
+    intervalo de latencia para no desplomarlo con una sola ráfaga de
+    respuestas lentas. La referencia es por tipo porque un /pokemon de 300 KB
+    siempre tarda varias veces más que un /move y no por ello es una señal de
+    congestión.
+    """
+
+    DECREASE_FACTOR = 0.5
+    LATENCY_WINDOW = 100
+    LATENCY_FLOOR = 0.05
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_tolerance: float):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._latencies: Dict[str, deque] = {}
+        self._decreased_at = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Ya se le había asignado un hueco: devolverlo
+                self.in_flight -= 1
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: Optional[float], overloaded: bool, kind: str = "") -> None:
+        """
+        Libera un hueco y ajusta el límite con la latencia y el resultado de la
+        petición. Sin latencia ni sobrecarga (petición cancelada o error interno)
+        no se sabe nada del servidor, así que solo se libera el hueco.
+        """
+        self.in_flight -= 1
+        if latency is None and not overloaded:
+            self._wake()
+            return
+        now = time.monotonic()
+        baseline = None
+        if latency is not None:
+            latencies = self._latencies.get(kind)
+            if latencies is None:
+                latencies = self._latencies[kind] = deque(maxlen=self.LATENCY_WINDOW)
+            latencies.append(latency)
+            baseline = min(latencies)
+        slow = (latency is not None and baseline is not None and latency > self.LATENCY_FLOOR
+                and latency > baseline * self.latency_tolerance)
+        if overloaded or slow:
+            if now - self._decreased_at >= max(latency or 0.0, self.LATENCY_FLOOR):
+                self.limit = max(self.minimum, self.limit * self.DECREASE_FACTOR)
+                self._decreased_at = now
+                self.decreases += 1
+        elif self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.increases += 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "min_latency_ms": {
+                kind or "other": round(min(latencies) * 1000, 1) for kind, latencies in self._latencies.items()
+            },
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+class HedgingPolicy:
+    """
+    Decide cuándo lanzar una petición de cobertura.
+
+    El retardo es el percentil `percentile` de las últimas latencias
+    observadas (no se cubre nada hasta tener MIN_SAMPLES). Cada petición
+    principal suma `budget` al saldo y cada cobertura gasta 1, de modo que a
+    largo plazo como mucho una fracción `budget` de las peticiones se duplica.
+    """
+
+    LATENCY_WINDOW = 200
+    MIN_SAMPLES = 20
+    MAX_BALANCE = 10.0
+
+    def __init__(self, percentile: float, budget: float):
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.budget = budget
+        self._latencies: deque = deque(maxlen=self.LATENCY_WINDOW)
+        self._balance = 0.0
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.over_budget = 0
+
+    def record(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """Segundos tras los que cubrir la petición (None si aún no hay datos)"""
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[round(self.percentile / 100 * (len(ordered) - 1))]
+
+    def start(self) -> None:
+        """Registra una petición principal, que aporta su parte al presupuesto"""
+        self.requests += 1
+        self._balance = min(self.MAX_BALANCE, self._balance + self.budget)
+
+    def try_hedge(self) -> bool:
+        if self._balance < 1:
+            self.over_budget += 1
+            return False
+        self._balance -= 1
+        self.hedged += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.delay()
+        return {
+            "percentile": self.percentile,
+            "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "over_budget": self.over_budget,
+        }
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de fallos sobre una ventana deslizante.
+
+    Cerrado: deja pasar todas las peticiones. Si en las últimas `window`
+    peticiones (y al menos `min_requests`) la tasa de fallos alcanza
+    `failure_rate`, se abre y rechaza todo durante `cooldown` segundos. Después
+    pasa a semiabierto y deja pasar una sola petición de prueba: si va bien se
+    cierra y si falla se vuelve a abrir.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window: int, min_requests: int, failure_rate: float, cooldown: float):
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._results: deque = deque(maxlen=max(1, window))
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Indica si una petición puede salir hacia la PokeAPI"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_started_at = None
+        # Semiabierto: una sola prueba a la vez (se libera si se queda colgada)
+        if self._probe_started_at is not None and now - self._probe_started_at < self.cooldown:
+            self.rejected += 1
+            return False
+        self._probe_started_at = now
+        return True
+
+    def record(self, success: bool) -> None:
+        if self.state == self.HALF_OPEN:
+            if success:
+                self.state = self.CLOSED
+                self._results.clear()
+            else:
+                self._open()
+            return
+        self._results.append(success)
+        if self.state == self.CLOSED and len(self._results) >= self.min_requests:
+            failures = self._results.count(False)
+            if failures / len(self._results) >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started_at = None
+        self._results.clear()
+        self.trips += 1
+
+    def stats(self) -> Dict[str, Any]:
+        failures = self._results.count(False)
+        return {
+            "state": self.state,
+            "window_requests": len(self._results),
+            "window_failure_rate": round(failures / len(self._results), 4) if self._results else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+class PokedexSnapshot:
+    """
+    Copia local compacta de los recursos /pokemon, /pokemon-species,
+    /evolution-chain, /type y /move de la PokeAPI.
+
+    Los recursos se indexan por ID y cada tipo tiene un índice de nombres, de
+    modo que cualquier URL de esos tipos se resuelve con un acceso a diccionario.
+    Se guarda como JSON comprimido con gzip.
+    """
+
+    FORMAT_VERSION = 1
+    KINDS = ("pokemon", "pokemon-species", "evolution-chain", "type", "move")
+
+    # Campos de primer nivel que usan las herramientas; el resto se descarta
+    FIELDS = {
+        "pokemon": ("id", "name", "height", "weight", "base_experience", "order", "is_default",
+                    "species", "types", "abilities", "stats", "sprites", "moves"),
+        "pokemon-species": ("id", "name", "order", "generation", "evolution_chain", "evolves_from_species",
+                            "is_baby", "is_legendary", "is_mythical", "varieties"),
+        "evolution-chain": ("id", "baby_trigger_item", "chain"),
+        "type": ("id", "name", "generation", "pokemon"),
+        "move": ("id", "name", "power", "accuracy", "pp", "priority", "type", "damage_class"),
+    }
+    SPRITE_FIELDS = ("front_default", "front_shiny", "back_default", "back_shiny")
+
+    def __init__(self, resources: Dict[str, Dict[int, Dict[str, Any]]], created_at: float,
+                 base_url: str = POKEAPI_BASE_URL):
+        self.resources = {kind: resources.get(kind, {}) for kind in self.KINDS}
+        self.created_at = created_at
+        self.base_url = base_url
+        self.aliases = {
+            kind: {data["name"]: resource_id for resource_id, data in items.items() if "name" in data}
+            for kind, items in self.resources.items()
+        }
+        self._listings: Dict[str, List[Dict[str, str]]] = {}
+
+    @classmethod
+    def compact(cls, kind: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduce un recurso a los campos que usan las herramientas"""
+        compact = {field: data[field] for field in cls.FIELDS[kind] if field in data}
+        if kind == "pokemon":
+            sprites = compact.get("sprites") or {}
+            compact["sprites"] = {field: sprites.get(field) for field in cls.SPRITE_FIELDS}
+            compact["moves"] = [
+                {
+                    "move": {"name": move_info["move"]["name"]},
+                    "version_group_details": [
+                        {
+                            "level_learned_at": details["level_learned_at"],
+                            "move_learn_method": {"name": details["move_learn_method"]["name"]},
+                            "version_group": {"name": details["version_group"]["name"]},
+                        }
+                        for details in move_info["version_group_details"]
+                    ],
+                }
+                for move_info in compact.get("moves", [])
+            ]
+        return compact
+
+    @classmethod
+    def load(cls, path: str) -> "PokedexSnapshot":
+        with gzip.open(os.path.expanduser(path), "rt", encoding="utf-8") as snapshot_file:
+            raw = json.load(snapshot_file)
+        if raw.get("format") != cls.FORMAT_VERSION:
+            raise ValueError(f"Formato de snapshot no soportado: {raw.get('format')}")
+        resources = {
+            kind: {int(resource_id): data for resource_id, data in raw["resources"].get(kind, {}).items()}
+            for kind in cls.KINDS
+        }
+        return cls(resources, raw.get("created_at", 0.0), raw.get("base_url", POKEAPI_BASE_URL))
+
+    def release_pokemon_payloads(self) -> None:
+        """
+        Sustituye cada /pokemon por su PokemonRecord y descarta sus `moves`.
+
+        Se llama una vez construidos StatsStore y LearnsetIndex: a partir de
+        ahí nadie lee el JSON completo, y los movimientos anidados son la mayor
+        parte de la memoria del snapshot. Un snapshot liberado no se puede guardar.
+        """
+        items = self.resources["pokemon"]
+        for resource_id, data in items.items():
+            if isinstance(data, dict):
+                items[resource_id] = PokemonRecord.from_payload(data)
+
+    def save(self, path: str) -> None:
+        raw = {
+            "format": self.FORMAT_VERSION,
+            "created_at": self.created_at,
+            "base_url": self.base_url,
+            "resources": self.resources,
+        }
+        with gzip.open(os.path.expanduser(path), "wt", encoding="utf-8") as snapshot_file:
+            json.dump(raw, snapshot_file, separators=(",", ":"))
+
+    def get(self, kind: str, name_or_id: Any) -> Any:
+        """Busca un recurso por ID o por nombre (un /pokemon liberado es un PokemonRecord)"""
+        items = self.resources.get(kind)
+        if items is None:
+            return None
+        key = str(name_or_id).lower()
+        resource_id = int(key) if key.isdigit() else self.aliases[kind].get(key)
+        return items.get(resource_id) if resource_id is not None else None
+
+    def covers(self, url: str) -> bool:
+        """Indica si la URL pertenece a un tipo de recurso incluido en el snapshot"""
+        return _resource_kind(url) in self.resources
+
+    def lookup(self, url: str) -> Any:
+        """Resuelve una URL de la PokeAPI (recurso o listado paginado) desde el snapshot"""
+        segments = _resource_path(url)
+        if not segments or segments[0] not in self.resources:
+            return None
+        if len(segments) == 1:
+            params = httpx.URL(url).params
+            return self._list_response(segments[0], int(params.get("offset", 0)), int(params.get("limit", 20)))
+        return self.get(segments[0], segments[1])
+
+    def _list_response(self, kind: str, offset: int, limit: int) -> Dict[str, Any]:
+        """Imita la respuesta paginada de /{kind}?offset=&limit="""
+        listing = self._listings.get(kind)
+        if listing is None:
+            listing = [
+                {
+                    "name": data.name if isinstance(data, PokemonRecord) else data.get("name", str(resource_id)),
+                    "url": f"{self.base_url}/{kind}/{resource_id}/",
+                }
+                for resource_id, data in sorted(self.resources[kind].items())
+            ]
+            self._listings[kind] = listing
+        return {
+            "count": len(listing),
+            "next": None,
+            "previous": None,
+            "results": listing[offset:offset + limit],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "created_at": self.created_at,
+            "resources": {kind: len(items) for kind, items in self.resources.items()},
+            "network_fallback": SNAPSHOT_NETWORK_FALLBACK,
+        }
+
+_snapshot: Optional[PokedexSnapshot] = None
+
+def _get_snapshot() -> Optional[PokedexSnapshot]:
+    """Carga el snapshot configurado en POKEMON_SNAPSHOT la primera vez que se usa"""
+    global _snapshot
+    if _snapshot is None and SNAPSHOT_PATH:
+        _snapshot = PokedexSnapshot.load(SNAPSHOT_PATH)
+    return _snapshot
+
+_response_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_BY_KIND, CACHE_DEFAULT_TTL,
+                                CACHE_POLICY, CACHE_MAX_BYTES_BY_KIND)
+_persistent_cache: Optional[SQLiteCache] = SQLiteCache(CACHE_DB_PATH, CACHE_DB_MAX_BYTES) if CACHE_DB_PATH else None
+# Las entradas negativas no ocupan bytes: solo se limitan por número
+_negative_cache = ResponseCache(NEGATIVE_CACHE_MAX_ENTRIES, sys.maxsize, NEGATIVE_CACHE_TTL_BY_KIND, NEGATIVE_CACHE_TTL)
+_upstream_flights = SingleFlight()
+_retry_policy = RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+_circuit_breaker = CircuitBreaker(BREAKER_WINDOW, BREAKER_MIN_REQUESTS, BREAKER_FAILURE_RATE, BREAKER_COOLDOWN)
+_rate_limiter = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+_hedging = HedgingPolicy(HEDGE_PERCENTILE, HEDGE_BUDGET)
+_concurrency_limiter = AdaptiveConcurrencyLimiter(CONCURRENCY_INITIAL, CONCURRENCY_MIN, CONCURRENCY_MAX,
+                                                  CONCURRENCY_LATENCY_TOLERANCE)
+_upstream_counters = {"stale_served": 0, "revalidations": 0, "not_modified": 0}
+# Referencias a los refrescos en segundo plano para que no los recoja el GC
+_revalidation_tasks: set = set()
+
+async def _fetch_json(url: str, projection: Optional[str] = None) -> Any:
+    """
+    Obtiene un recurso JSON de la PokeAPI pasando por el snapshot local (si
+    está configurado), la caché en memoria y, si está configurada, la caché
+    persistente en SQLite.
+
+    Las llamadas concurrentes para la misma URL comparten una única petición
+    (single-flight), incluido su resultado o su error. Una entrada caducada
+    hace menos de CACHE_STALE_TTL segundos se devuelve al instante y se
+    revalida en segundo plano (stale-while-revalidate).
+
+    Devuelve None si el recurso no existe (404); los 404 se recuerdan durante
+    un tiempo corto en la caché negativa. Cualquier otra respuesta distinta de
+    200 lanza PokeAPIError y no se cachea. Si la PokeAPI falla (o el circuit
+    breaker está abierto) y hay una copia caducada del recurso, se sirve esa.
+
+    Con `projection` (una clave de PROJECTIONS) se devuelve y se cachea el
+    registro compacto correspondiente en lugar del JSON completo.
+
+    Con snapshot y POKEMON_SNAPSHOT_NETWORK_FALLBACK=false nunca se sale a la
+    red: lo que el snapshot no tiene devuelve None.
+    """
+    snapshot = _get_snapshot()
+    if snapshot is not None and not snapshot.covers(url) and not SNAPSHOT_NETWORK_FALLBACK:
+        # Sin red: lo que no está en el snapshot (/generation, /ability...) no existe
+        return None
+    if snapshot is not None and snapshot.covers(url):
+        data = snapshot.lookup(url)
+        if isinstance(data, PokemonRecord):
+            # Liberado tras construir los índices: solo queda la proyección resumida
+            if projection == "pokemon-summary":
+                return data
+            data = None
+        if data is not None or not SNAPSHOT_NETWORK_FALLBACK:
+            return _project(data, projection) if projection and data is not None else data
+
+    key = _cache_key(url, projection)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+    if _negative_cache.get(_cache_key(url)) is not None:
+        return None
+    if CACHE_STALE_TTL > 0:
+        stale = _response_cache.get_stale(key, CACHE_STALE_TTL)
+        if stale is not None:
+            _revalidate_in_background(url, key, projection)
+            return stale
+
+    return await _upstream_flights.do(key, partial(_load_json, url, key, projection=projection))
+
+def _revalidate_in_background(url: str, key: str, projection: Optional[str] = None) -> None:
+    """Lanza la revalidación de una URL sin esperarla (se agrupa con cualquier carga en curso)"""
+    running = _upstream_flights.running(key)
+    if running is not None:
+        # Desde la propia carga (copia caducada de SQLite): revalidar cuando termine
+        if running is asyncio.current_task():
+            running.add_done_callback(lambda _: _revalidate_in_background(url, key, projection))
+        return
+    _upstream_counters["revalidations"] += 1
+    task = asyncio.ensure_future(
+        _upstream_flights.do(key, partial(_load_json, url, key, revalidate=True, projection=projection))
+    )
+    _revalidation_tasks.add(task)
+    task.add_done_callback(_revalidation_done)
+
+def _revalidation_done(task: asyncio.Future) -> None:
+    _revalidation_tasks.discard(task)
+    # Si falla, la entrada caducada sigue sirviéndose hasta el siguiente intento
+    if not task.cancelled():
+        task.exception()
+
+def _response_validators(response: httpx.Response, previous: Validators = (None, None)) -> Validators:
+    """ETag y Last-Modified de una respuesta (un 304 puede no repetirlos)"""
+    return (response.headers.get("etag") or previous[0],
+            response.headers.get("last-modified") or previous[1])
+
+def _conditional_headers(validators: Validators) -> Dict[str, str]:
+    etag, last_modified = validators
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+async def _load_json(url: str, key: str, revalidate: bool = False,
+                     projection: Optional[str] = None) -> Any:
+    """
+    Carga una URL desde la caché persistente o desde la PokeAPI y la cachea.
+
+    Si ya hay una copia del recurso (caducada), la petición es condicional
+    (If-None-Match / If-Modified-Since) y un 304 solo renueva su vigencia, sin
+    descargar ni parsear el cuerpo. Con revalidate=True se consulta siempre
+    la PokeAPI. Con `projection` el cuerpo se convierte en el registro de la
+    proyección justo después de decodificarlo y el resto se descarta sin
+    llegar a la caché.
+    """
+    kind = _resource_kind(url)
+    ttl = _response_cache.ttl_for(kind)
+    previous = _response_cache.entry(key)
+    if _persistent_cache is not None and (previous is None or not revalidate):
+        max_stale = float("inf") if revalidate else CACHE_STALE_TTL
+        stored = await asyncio.to_thread(_persistent_cache.get, key, ttl, max_stale)
+        if stored is not None:
+            data, size, fetched_at, validators = stored
+            data = _stored_value(data, projection)
+            size = _retained_size(data, size)
+            remaining = ttl - (time.time() - fetched_at)
+            _response_cache.set(key, data, size, kind, ttl=remaining, validators=validators)
+            previous = (size, data, validators)
+            if not revalidate:
+                if remaining <= 0:
+                    _response_cache.stale_hits += 1
+                    _revalidate_in_background(url, key, projection)
+                return data
+
+    try:
+        headers = _conditional_headers(previous[2]) if previous is not None else None
+        response = await _get_with_retries(url, headers)
+        if response.status_code not in (200, 404) and not (response.status_code == 304 and previous):
+            raise PokeAPIError(response.status_code, url)
+    except (PokeAPIError, CircuitOpenError, httpx.TransportError):
+        stale = await _load_stale(key, kind, projection)
+        if stale is None:
+            raise
+        return stale
+    if response.status_code == 404:
+        _negative_cache.set(_cache_key(url), True, 0, kind)
+        _response_cache.discard(key)
+        return None
+
+    fetched_at = time.time()
+    if response.status_code == 304:
+        size, data, validators = previous
+        _upstream_counters["not_modified"] += 1
+        _response_cache.set(key, data, size, kind, validators=_response_validators(response, validators))
+        if _persistent_cache is not None:
+            await asyncio.to_thread(_persistent_cache.touch, key, fetched_at)
+        return data
+
+    data = _json_loads(response.content)
+    stored = data
+    if projection:
+        data = _project(data, projection)
+        stored = data.to_json()
+    size = _retained_size(data, len(response.content))
+    validators = _response_validators(response)
+    _response_cache.set(key, data, size, kind, validators=validators)
+    if _persistent_cache is not None:
+        await asyncio.to_thread(_persistent_cache.set, key, stored, fetched_at, validators)
+    return data
+
+async def _load_stale(key: str, kind: str, projection: Optional[str] = None) -> Any:
+    """Copia caducada de una URL (en memoria o en SQLite) para cuando la PokeAPI falla"""
+    data = _response_cache.get_stale(key)
+    if data is None and _persistent_cache is not None:
+        stored = await asyncio.to_thread(_persistent_cache.get, key, 0.0, float("inf"))
+        if stored is not None:
+            data, size, _, validators = stored
+            data = _stored_value(data, projection)
+            size = _retained_size(data, size)
+            # Se guarda ya expirada: la próxima llamada volverá a intentar la PokeAPI
+            _response_cache.set(key, data, size, kind, ttl=0, validators=validators)
+    if data is not None:
+        _upstream_counters["stale_served"] += 1
+    return data
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Segundos de la cabecera Retry-After (solo el formato numérico)"""
+    value = response.headers.get("retry-after", "").strip()
+    return float(value) if value.isdigit() else None
+
+async def _get_with_retries(url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """
+    GET a la PokeAPI detrás del circuit breaker, reintentando los timeouts,
+    los errores de conexión y las respuestas 429/5xx con backoff exponencial.
+
+    Cada intento pasa por el limitador de ritmo global y ocupa un hueco del
+    limitador de concurrencia adaptativa, al que se informa de su latencia.
+
+    Devuelve la última respuesta (que puede ser un 5xx si se agotan los
+    intentos) o lanza la última excepción de red o CircuitOpenError.
+    """
+    attempt = 0
+    while True:
+        if not _circuit_breaker.allow():
+            raise CircuitOpenError(url)
+        retry_after = None
+        try:
+            response = await _send_hedged(url, headers)
+        except httpx.TransportError:
+            _circuit_breaker.record(False)
+            if attempt + 1 >= _retry_policy.max_attempts:
+                _retry_policy.exhausted += 1
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                _circuit_breaker.record(True)
+                return response
+            _circuit_breaker.record(False)
+            if attempt + 1 >= _retry_policy.max_attempts:
+                _retry_policy.exhausted += 1
+                return response
+            retry_after = _retry_after(response)
+        attempt += 1
+        _retry_policy.retries += 1
+        await asyncio.sleep(_retry_policy.delay(attempt, retry_after))
+
+async def _send_limited(url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+    """Un GET a la PokeAPI respetando el token bucket y el límite de concurrencia"""
+    await _rate_limiter.acquire()
+    await _concurrency_limiter.acquire()
+    started = time.monotonic()
+    latency, overloaded = None, True
+    try:
+        response = await _get_http_client().get(url, headers=headers)
+        latency = time.monotonic() - started
+        overloaded = response.status_code in RETRY_STATUS_CODES
+        if not overloaded:
+            _hedging.record(latency)
+        return response
+    except httpx.TransportError:
+        raise
+    except BaseException:
+        # Cancelaciones y errores propios: no dicen nada de la salud de la PokeAPI
+        overloaded = False
+        raise
+    finally:
+        _concurrency_limiter.release(latency, overloaded, _resource_kind(url))
+
+def _mirror_url(url: str) -> str:
+    """La misma URL en el espejo configurado para las coberturas (o la original)"""
+    if HEDGE_MIRROR_URL and url.startswith(POKEAPI_BASE_URL):
+        return HEDGE_MIRROR_URL + url[len(POKEAPI_BASE_URL):]
+    return url
+
+async def _send_hedged(url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+    """
+    Un GET con cobertura opcional: si no ha terminado tras el percentil de
+    latencia configurado (y queda presupuesto), lanza un segundo GET idéntico,
+    devuelve la primera respuesta y cancela la otra petición.
+    """
+    if not HEDGE_ENABLED:
+        return await _send_limited(url, headers)
+    _hedging.start()
+    delay = _hedging.delay()
+    primary = asyncio.ensure_future(_send_limited(url, headers))
+    tasks = [primary]
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and _hedging.try_hedge():
+                tasks.append(asyncio.ensure_future(_send_limited(_mirror_url(url), headers)))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    if task is not primary:
+                        _hedging.hedge_wins += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _map_bounded(fn: Callable[[Any], Awaitable[Any]], items: List[Any],
+                       concurrency: int = FANOUT_CONCURRENCY,
+                       timeout: Optional[float] = None) -> Tuple[List[Any], int]:
+    """
+    Ejecuta fn(item) para cada elemento en paralelo, con como máximo
+    `concurrency` llamadas a la vez y un plazo total opcional.
+
+    Devuelve los resultados en el mismo orden que `items` (las llamadas que
+    fallan o no terminan a tiempo aparecen como la excepción correspondiente,
+    asyncio.TimeoutError en el segundo caso) y el número de llamadas que no
+    terminaron dentro del plazo.
+    """
+    if not items:
+        return [], 0
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    results = []
+    for task in tasks:
+        if task in pending:
+            results.append(asyncio.TimeoutError())
+        elif task.exception() is not None:
+            results.append(task.exception())
+        else:
+            results.append(task.result())
+    return results, len(pending)
+
+class StatsStore:
+    """
+    Estadísticas base de todos los Pokémon en formato columnar.
+
+    Cada estadística (y el total) es un array de NumPy con una fila por
+    Pokémon; `_row_of_id` traduce un ID de la PokeAPI a su fila. Las consultas
+    (top-N, percentiles, filtros por rango) son operaciones vectorizadas sobre
+    todo el dex.
+    """
+
+    COLUMNS = STAT_NAMES + ("total",)
+
+    def __init__(self, ids: List[int], names: List[str], rows: List[List[int]]):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.names = names
+        matrix = np.asarray(rows, dtype=np.int16).reshape(len(ids), len(STAT_NAMES))
+        self.columns: Dict[str, np.ndarray] = {
+            stat: np.ascontiguousarray(matrix[:, index]) for index, stat in enumerate(STAT_NAMES)
+        }
+        self.columns["total"] = matrix.sum(axis=1, dtype=np.int16)
+        self._row_of_id = np.full(int(self.ids.max()) + 1 if len(ids) else 1, -1, dtype=np.int32)
+        self._row_of_id[self.ids] = np.arange(len(ids), dtype=np.int32)
+        self._row_of_name = {name: row for row, name in enumerate(names)}
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[Dict[str, Any]]) -> "StatsStore":
+        """Construye el almacén a partir de respuestas de /pokemon"""
+        ids, names, rows = [], [], []
+        for pokemon_data in payloads:
+            pokemon_id, name, row = cls.row_from_payload(pokemon_data)
+            ids.append(pokemon_id)
+            names.append(name)
+            rows.append(row)
+        return cls(ids, names, rows)
+
+    @staticmethod
+    def row_from_payload(pokemon_data: Dict[str, Any]) -> Tuple[int, str, List[int]]:
+        """(ID, nombre, estadísticas en el orden de STAT_NAMES) de una respuesta de /pokemon"""
+        stats = {stat["stat"]["name"].replace("-", "_"): stat["base_stat"] for stat in pokemon_data["stats"]}
+        return pokemon_data["id"], pokemon_data["name"], [stats.get(stat_name, 0) for stat_name in STAT_NAMES]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def column_name(stat: str) -> str:
+        """Normaliza el nombre de una estadística ("special-attack" -> "special_attack")"""
+        name = stat.strip().lower().replace("-", "_").replace(" ", "_")
+        if name not in StatsStore.COLUMNS:
+            raise ValueError(f"Estadística '{stat}' no válida. Opciones: {', '.join(StatsStore.COLUMNS)}")
+        return name
+
+    def row_of(self, name_or_id: str) -> Optional[int]:
+        key = str(name_or_id).strip().lower()
+        if key.isdigit():
+            pokemon_id = int(key)
+            row = int(self._row_of_id[pokemon_id]) if pokemon_id < len(self._row_of_id) else -1
+            return row if row >= 0 else None
+        return self._row_of_name.get(key)
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Convierte una fila en el diccionario que devuelven las herramientas"""
+        return {
+            "id": int(self.ids[row]),
+            "name": self.names[row].title(),
+            "stats": {stat: int(self.columns[stat][row]) for stat in STAT_NAMES},
+            "total": int(self.columns["total"][row]),
+        }
+
+    def top(self, stat: str, n: int, ascending: bool = False) -> List[int]:
+        """Filas de los n Pokémon con mayor (o menor) valor de la estadística"""
+        column = self.columns[self.column_name(stat)]
+        n = max(0, min(n, len(column)))
+        if n == 0:
+            return []
+        keys = column if ascending else -column.astype(np.int32)
+        candidates = np.argpartition(keys, n - 1)[:n]
+        # Orden estable: por valor y, en empate, por ID
+        order = np.lexsort((self.ids[candidates], keys[candidates]))
+        return candidates[order].tolist()
+
+    def percentiles(self, row: int) -> Dict[str, float]:
+        """Percentil de cada estadística (porcentaje de Pokémon con valor menor, empates a la mitad)"""
+        result = {}
+        for stat in self.COLUMNS:
+            column = self.columns[stat]
+            value = column[row]
+            below = np.count_nonzero(column < value)
+            equal = np.count_nonzero(column == value)
+            result[stat] = round(100.0 * float(below + 0.5 * equal) / len(column), 1)
+        return result
+
+    def filter(self, min_stats: Dict[str, int], max_stats: Dict[str, int]) -> List[int]:
+        """Filas que cumplen todos los rangos (límites inclusivos), ordenadas por ID"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for stat, minimum in min_stats.items():
+            mask &= self.columns[self.column_name(stat)] >= minimum
+        for stat, maximum in max_stats.items():
+            mask &= self.columns[self.column_name(stat)] <= maximum
+        rows = np.flatnonzero(mask)
+        return rows[np.argsort(self.ids[rows], kind="stable")].tolist()
+
+def _evolution_condition(details: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resume un elemento de evolution_details: el desencadenante y solo las
+    condiciones presentes (nivel, objeto, amistad, momento del día, ...)
+    """
+    condition = {"trigger": details["trigger"]["name"] if details.get("trigger") else None}
+    for field, value in details.items():
+        if field == "trigger" or value is None or value == "" or value is False:
+            continue
+        if isinstance(value, dict):
+            value = value.get("name")
+        condition[field] = value
+    return condition
+
+def _parse_evolution_chain(chain_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Función recursiva para parsear la cadena de evolución"""
+    evolution_info = {
+        "species": chain_data["species"]["name"],
+        "min_level": None,
+        "trigger": None,
+        "conditions": [_evolution_condition(details) for details in chain_data["evolution_details"]],
+        "evolves_to": []
+    }
+    
+    if chain_data["evolution_details"]:
+        details = chain_data["evolution_details"][0]
+        evolution_info["min_level"] = details.get("min_level")
+        evolution_info["trigger"] = details["trigger"]["name"] if details["trigger"] else None
+    
+    for evolution in chain_data["evolves_to"]:
+        evolution_info["evolves_to"].append(_parse_evolution_chain(evolution))
+    
+    return evolution_info
+
+class EvolutionIndex:
+    """
+    Cadenas de evolución ya parseadas, indexadas por ID de cadena, y un índice
+    especie -> ID de cadena.
+
+    Todos los miembros de una familia (charmander, charmeleon, charizard)
+    comparten la misma cadena: tras la primera consulta cualquiera de ellos se
+    responde desde memoria. El número de cadenas está acotado por el dex, así
+    que no se expulsan entradas.
+    """
+
+    def __init__(self):
+        self.chains: Dict[int, Dict[str, Any]] = {}
+        self.species_to_chain: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def add_chain(self, chain_id: int, chain_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Parsea una cadena y registra todas sus especies (por nombre y por ID)"""
+        parsed = _parse_evolution_chain(chain_data)
+        self.chains[chain_id] = parsed
+        pending = [chain_data]
+        while pending:
+            node = pending.pop()
+            species = node["species"]
+            self.species_to_chain[species["name"]] = chain_id
+            species_id = _id_from_url(species.get("url") or "")
+            if species_id is not None:
+                self.species_to_chain[str(species_id)] = chain_id
+            pending.extend(node["evolves_to"])
+        return parsed
+
+    def add_alias(self, key: str, species_name: str, species_id: int, chain_id: Optional[int]) -> None:
+        """Asocia la clave consultada (nombre o ID) a la cadena de la especie"""
+        if chain_id is None or chain_id not in self.chains:
+            return
+        for alias in (key, species_name, str(species_id)):
+            self.species_to_chain[alias] = chain_id
+
+    def get_by_chain(self, chain_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        return self.chains.get(chain_id) if chain_id is not None else None
+
+    def get_by_species(self, key: str) -> Optional[Dict[str, Any]]:
+        chain_id = self.species_to_chain.get(key)
+        if chain_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.chains[chain_id]
+
+    def load_snapshot(self, snapshot: "PokedexSnapshot") -> None:
+        """Construye el índice completo a partir de las cadenas del snapshot"""
+        for chain_id, evolution_data in snapshot.resources["evolution-chain"].items():
+            self.add_chain(chain_id, evolution_data["chain"])
+        for species_data in snapshot.resources["pokemon-species"].values():
+            chain_id = _id_from_url((species_data.get("evolution_chain") or {}).get("url") or "")
+            self.add_alias(species_data["name"], species_data["name"], species_data["id"], chain_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chains": len(self.chains),
+            "species": len(self.species_to_chain),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+_evolution_index = EvolutionIndex()
+
+class EvolutionGraph:
+    """
+    Grafo de evoluciones de todo el dex, precalculado en memoria.
+
+    Cada arista (especie origen -> especie destino) conserva todas sus
+    condiciones de evolución. Hay listas de adyacencia en ambos sentidos e
+    índices secundarios por desencadenante (level-up, trade, use-item...) y por
+    objeto (item o held_item), de modo que las consultas inversas no necesitan
+    recorrer las cadenas ni hacer peticiones.
+    """
+
+    def __init__(self):
+        self.forward: Dict[str, List[Dict[str, Any]]] = {}
+        self.backward: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_trigger: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_item: Dict[str, List[Dict[str, Any]]] = {}
+        self.species: set = set()
+
+    def add_chain(self, chain_data: Dict[str, Any]) -> None:
+        pending = [chain_data]
+        while pending:
+            node = pending.pop()
+            source = node["species"]["name"]
+            self.species.add(source)
+            for evolution in node["evolves_to"]:
+                edge = {
+                    "from": source,
+                    "to": evolution["species"]["name"],
+                    "conditions": [_evolution_condition(details) for details in evolution["evolution_details"]],
+                }
+                self.forward.setdefault(edge["from"], []).append(edge)
+                self.backward.setdefault(edge["to"], []).append(edge)
+                triggers = {condition["trigger"] for condition in edge["conditions"] if condition["trigger"]}
+                items = {
+                    condition[field] for condition in edge["conditions"]
+                    for field in ("item", "held_item") if field in condition
+                }
+                for trigger in triggers:
+                    self.by_trigger.setdefault(trigger, []).append(edge)
+                for item in items:
+                    self.by_item.setdefault(item, []).append(edge)
+                pending.append(evolution)
+
+    def pre_evolutions(self, species: str) -> List[Dict[str, Any]]:
+        """Aristas desde la especie hasta la base de su familia (la más cercana primero)"""
+        result = []
+        current = species
+        while self.backward.get(current):
+            edge = self.backward[current][0]
+            result.append(edge)
+            current = edge["from"]
+        return result
+
+    def final_forms(self, include_single_stage: bool = False) -> set:
+        """Especies que no evolucionan más (por defecto, solo las que vienen de otra)"""
+        return {
+            species for species in self.species
+            if species not in self.forward and (include_single_stage or species in self.backward)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "species": len(self.species),
+            "edges": sum(len(edges) for edges in self.forward.values()),
+            "triggers": len(self.by_trigger),
+            "items": len(self.by_item),
+        }
+
+class LearnsetIndex:
+    """
+    Movimientos que aprende cada Pokémon (Pokémon x movimiento x grupo de
+    versiones x método x nivel) en arrays de enteros.
+
+    Los nombres se codifican con vocabularios y cada aprendizaje es una fila
+    de cinco columnas. Las filas están agrupadas por Pokémon en el orden de la
+    PokeAPI (con offsets, como una matriz CSR) y hay una permutación por
+    movimiento, así que tanto "movimientos de X" como "quién aprende M" son
+    rebanadas de arrays en lugar de descargar y parsear /pokemon.
+
+    Se construye a partir de entradas compactas (ver entry_from_payload), así
+    que no hace falta tener todas las respuestas de /pokemon a la vez en memoria.
+    """
+
+    # (nombre, ID, [(movimiento, grupo de versiones, método, nivel), ...])
+    Entry = Tuple[str, int, List[Tuple[str, str, str, int]]]
+
+    @staticmethod
+    def entry_from_payload(pokemon_data: Dict[str, Any]) -> "LearnsetIndex.Entry":
+        """Aprendizajes de una respuesta de /pokemon, en el orden de la PokeAPI"""
+        learnset = [
+            (move_info["move"]["name"], details["version_group"]["name"],
+             details["move_learn_method"]["name"], details["level_learned_at"])
+            for move_info in pokemon_data["moves"]
+            for details in move_info["version_group_details"]
+        ]
+        return pokemon_data["name"], pokemon_data["id"], learnset
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[Dict[str, Any]]) -> "LearnsetIndex":
+        return cls(cls.entry_from_payload(pokemon_data) for pokemon_data in payloads)
+
+    def __init__(self, entries: Iterable["LearnsetIndex.Entry"]):
+        self.pokemon_names: List[str] = []
+        self.pokemon_ids: List[int] = []
+        self.move_names: List[str] = []
+        self.version_groups: List[str] = []
+        self.methods: List[str] = []
+        move_codes: Dict[str, int] = {}
+        version_group_codes: Dict[str, int] = {}
+        method_codes: Dict[str, int] = {}
+        pokemon_column, move_column, version_group_column, method_column, level_column = [], [], [], [], []
+        offsets = [0]
+        
+        for name, pokemon_id, learnset in entries:
+            pokemon_code = len(self.pokemon_names)
+            self.pokemon_names.append(name)
+            self.pokemon_ids.append(pokemon_id)
+            for move, version_group, method, level in learnset:
+                pokemon_column.append(pokemon_code)
+                move_column.append(move_codes.setdefault(move, len(move_codes)))
+                version_group_column.append(version_group_codes.setdefault(version_group, len(version_group_codes)))
+                method_column.append(method_codes.setdefault(method, len(method_codes)))
+                level_column.append(level)
+            offsets.append(len(pokemon_column))
+        
+        self.move_names = list(move_codes)
+        self.version_groups = list(version_group_codes)
+        self.methods = list(method_codes)
+        self._move_codes = move_codes
+        self._version_group_codes = version_group_codes
+        self._method_codes = method_codes
+        self._pokemon_codes = {name: code for code, name in enumerate(self.pokemon_names)}
+        self._pokemon_codes.update({str(pokemon_id): code for code, pokemon_id in enumerate(self.pokemon_ids)})
+        
+        self.pokemon = np.asarray(pokemon_column, dtype=np.int16)
+        self.move = np.asarray(move_column, dtype=np.int16)
+        self.version_group = np.asarray(version_group_column, dtype=np.uint8)
+        self.method = np.asarray(method_column, dtype=np.uint8)
+        self.level = np.asarray(level_column, dtype=np.uint8)
+        self.pokemon_offsets = np.asarray(offsets, dtype=np.int64)
+        self.by_move = np.argsort(self.move, kind="stable")
+        self.move_offsets = np.searchsorted(self.move[self.by_move], np.arange(len(self.move_names) + 1))
+
+    def __len__(self) -> int:
+        return len(self.move)
+
+    def pokemon_code(self, name_or_id: str) -> Optional[int]:
+        return self._pokemon_codes.get(str(name_or_id).strip().lower())
+
+    def _mask(self, rows: np.ndarray, version_group: Optional[str], learn_method: Optional[str]) -> Optional[np.ndarray]:
+        """Filtra filas por grupo de versiones y método (None si algún nombre no existe)"""
+        if version_group is not None:
+            code = self._version_group_codes.get(version_group)
+            if code is None:
+                return None
+            rows = rows[self.version_group[rows] == code]
+        if learn_method is not None:
+            code = self._method_codes.get(learn_method)
+            if code is None:
+                return None
+            rows = rows[self.method[rows] == code]
+        return rows
+
+    def learnset(self, pokemon_code: int) -> List[Tuple[str, List[Tuple[str, str, int]]]]:
+        """
+        Movimientos de un Pokémon en el orden de la PokeAPI, cada uno con sus
+        detalles (grupo de versiones, método, nivel)
+        """
+        start, end = self.pokemon_offsets[pokemon_code], self.pokemon_offsets[pokemon_code + 1]
+        learnset: List[Tuple[str, List[Tuple[str, str, int]]]] = []
+        previous_move = -1
+        for move, version_group, method, level in zip(
+            self.move[start:end].tolist(), self.version_group[start:end].tolist(),
+            self.method[start:end].tolist(), self.level[start:end].tolist()
+        ):
+            if move != previous_move:
+                learnset.append((self.move_names[move], []))
+                previous_move = move
+            learnset[-1][1].append((self.version_groups[version_group], self.methods[method], level))
+        return learnset
+
+    def pokemon_learning(self, move_name: str, version_group: Optional[str] = None,
+                         learn_method: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Pokémon que aprenden un movimiento, con sus métodos y el nivel mínimo por level-up"""
+        move_code = self._move_codes.get(move_name)
+        if move_code is None:
+            return []
+        rows = self.by_move[self.move_offsets[move_code]:self.move_offsets[move_code + 1]]
+        rows = self._mask(rows, version_group, learn_method)
+        if rows is None or len(rows) == 0:
+            return []
+        
+        # Agrupar las filas por Pokémon: cada grupo es una rebanada contigua
+        rows = rows[np.argsort(self.pokemon[rows], kind="stable")]
+        pokemon_codes, starts = np.unique(self.pokemon[rows], return_index=True)
+        group_sizes = np.diff(np.append(starts, len(rows)))
+        groups = np.repeat(np.arange(len(pokemon_codes)), group_sizes)
+        
+        # Métodos de cada Pokémon (matriz Pokémon x método) y nivel mínimo por level-up
+        methods = self.method[rows]
+        has_method = np.zeros((len(pokemon_codes), len(self.methods)), dtype=bool)
+        has_method[groups, methods] = True
+        level_up = self._method_codes.get("level-up")
+        no_level = np.int16(256)
+        levels = np.where(methods == level_up, self.level[rows].astype(np.int16), no_level) \
+            if level_up is not None else np.full(len(rows), no_level)
+        min_levels = np.minimum.reduceat(levels, starts)
+        
+        result = [
+            {
+                "id": self.pokemon_ids[pokemon_code],
+                "name": self.pokemon_names[pokemon_code].title(),
+                "learn_methods": [self.methods[method] for method in np.flatnonzero(method_row).tolist()],
+                "min_level": min_level if min_level != no_level else None
+            }
+            for pokemon_code, method_row, min_level in zip(pokemon_codes.tolist(), has_method, min_levels.tolist())
+        ]
+        result.sort(key=lambda pokemon: pokemon["id"])
+        return result
+
+    def moves_by_level(self, pokemon_code: int, max_level: int,
+                       version_group: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Movimientos por level-up hasta `max_level` (inclusive), ordenados por nivel"""
+        rows = np.arange(self.pokemon_offsets[pokemon_code], self.pokemon_offsets[pokemon_code + 1])
+        rows = self._mask(rows, version_group, "level-up")
+        if rows is None:
+            return []
+        rows = rows[self.level[rows] <= max_level]
+        
+        # Nivel más bajo de cada movimiento entre los grupos de versiones seleccionados
+        best: Dict[int, int] = {}
+        for move, level in zip(self.move[rows].tolist(), self.level[rows].tolist()):
+            if move not in best or level < best[move]:
+                best[move] = level
+        return [
+            {"name": self.move_names[move].replace("-", " ").title(), "level_learned": level}
+            for move, level in sorted(best.items(), key=lambda item: (item[1], self.move_names[item[0]]))
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self.move),
+            "pokemon": len(self.pokemon_names),
+            "moves": len(self.move_names),
+            "version_groups": len(self.version_groups),
+            "bytes": int(sum(column.nbytes for column in (
+                self.pokemon, self.move, self.version_group, self.method, self.level,
+                self.pokemon_offsets, self.by_move, self.move_offsets
+            )))
+        }
+
+def _edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Distancia de Levenshtein acotada: devuelve max_distance + 1 si se supera"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+class NameIndex:
+    """
+    Índice local de nombres de Pokémon y especies.
+
+    Resuelve lo que escribe el usuario ("Mr. Mime", "25", "Pikachu") al nombre
+    canónico de la PokeAPI antes de hacer ninguna petición, ofrece
+    autocompletado por prefijo (lista ordenada + bisect) y sugerencias por
+    distancia de edición para los nombres mal escritos.
+    """
+
+    def __init__(self, pokemon: Dict[str, int], species: Dict[str, int]):
+        self.pokemon = pokemon
+        self.species = species
+        self.pokemon_by_id = {pokemon_id: name for name, pokemon_id in pokemon.items()}
+        self.species_by_id = {species_id: name for name, species_id in species.items()}
+        self.names = sorted(set(pokemon) | set(species))
+
+    @classmethod
+    def from_listings(cls, pokemon_listing: Dict[str, Any], species_listing: Dict[str, Any]) -> "NameIndex":
+        """Construye el índice a partir de /pokemon?limit= y /pokemon-species?limit="""
+        def entries(listing):
+            return {
+                item["name"]: resource_id for item in listing["results"]
+                if (resource_id := _id_from_url(item["url"])) is not None
+            }
+        return cls(entries(pokemon_listing), entries(species_listing))
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normaliza al formato de la PokeAPI: "Mr. Mime" -> "mr-mime", "Flabébé" -> "flabebe" """
+        text = str(query).strip().lower().replace("♀", "-f").replace("♂", "-m")
+        text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+        for char in (".", "'", "’", ":"):
+            text = text.replace(char, "")
+        text = "-".join(text.replace("_", " ").replace("-", " ").split())
+        return text
+
+    def resolve(self, query: str, kind: str = "pokemon") -> Optional[str]:
+        """
+        Devuelve el nombre canónico del recurso ("pokemon" o "pokemon-species")
+        o None si no existe. Los IDs se traducen a nombre.
+        """
+        key = self.normalize(query)
+        if kind == "pokemon":
+            if key.isdigit():
+                return self.pokemon_by_id.get(int(key))
+            if key in self.pokemon:
+                return key
+            # Una especie sin Pokémon homónimo (ej: "deoxys") usa su variedad por defecto (mismo ID)
+            if key in self.species:
+                return self.pokemon_by_id.get(self.species[key])
+            return None
+        
+        if key.isdigit():
+            return self.species_by_id.get(int(key))
+        if key in self.species:
+            return key
+        # Una forma (ej: "raichu-alola") pertenece a la especie de su prefijo
+        if key in self.pokemon:
+            pokemon_id = self.pokemon[key]
+            if pokemon_id in self.species_by_id:
+                return self.species_by_id[pokemon_id]
+            parts = key.split("-")
+            for end in range(len(parts) - 1, 0, -1):
+                candidate = "-".join(parts[:end])
+                if candidate in self.species:
+                    return candidate
+        return None
+
+    def species_id_of(self, pokemon_id: int) -> Optional[int]:
+        """ID de la especie de un Pokémon (las formas alternativas usan la de su prefijo)"""
+        if pokemon_id in self.species_by_id:
+            return pokemon_id
+        name = self.pokemon_by_id.get(pokemon_id)
+        species_name = self.resolve(name, "pokemon-species") if name is not None else None
+        return self.species.get(species_name) if species_name is not None else None
+
+    def prefix(self, query: str, limit: int = 10) -> List[str]:
+        """Nombres que empiezan por el texto indicado, en orden alfabético"""
+        key = self.normalize(query)
+        if not key:
+            return []
+        start = bisect.bisect_left(self.names, key)
+        matches = []
+        for name in self.names[start:]:
+            if not name.startswith(key) or len(matches) >= limit:
+                break
+            matches.append(name)
+        return matches
+
+    def fuzzy(self, query: str, limit: int = 5) -> List[str]:
+        """Nombres más cercanos por distancia de edición (tolerancia según la longitud)"""
+        key = self.normalize(query)
+        if not key:
+            return []
+        max_distance = max(1, min(3, len(key) // 4))
+        scored = []
+        for name in self.names:
+            distance = _edit_distance(key, name, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, name))
+        scored.sort()
+        return [name for _, name in scored[:limit]]
+
+    def suggest(self, query: str, limit: int = 5) -> List[str]:
+        """Autocompletado por prefijo y, si no alcanza, sugerencias aproximadas"""
+        suggestions = self.prefix(query, limit)
+        if len(suggestions) < limit:
+            for name in self.fuzzy(query, limit):
+                if name not in suggestions:
+                    suggestions.append(name)
+        return suggestions[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pokemon": len(self.pokemon),
+            "species": len(self.species),
+            "names": len(self.names),
+        }
+
+_stats_store: Optional[StatsStore] = None
+_learnset_index: Optional[LearnsetIndex] = None
+
+class BackgroundIndexBuild:
+    """
+    Construcción en segundo plano de un índice que necesita todos los
+    recursos de un tipo cuando no hay snapshot.
+
+    Recorrer el listado completo lleva de segundos a más de un minuto con el
+    límite de ritmo por defecto, así que las herramientas no lo esperan:
+    `building()` lanza el recorrido (si no está en marcha) y devuelve un
+    IndexBuildingError con el progreso. Los recursos se descargan
+    directamente, sin pasar por la caché de respuestas (que expulsaría todo
+    lo demás), y de cada uno solo se conserva lo que devuelve `extract`. Si
+    falla alguna descarga no se publica nada; el siguiente `building()`
+    vuelve a intentarlo descargando solo lo que faltaba.
+    """
+
+    def __init__(self, label: str, kind: str, extract: Callable[[Dict[str, Any]], Any],
+                 publish: Callable[[List[Any]], None]):
+        self.label = label
+        self.kind = kind
+        self.extract = extract
+        self.publish = publish
+        self.task: Optional[asyncio.Task] = None
+        self.downloaded = 0
+        self.total = 0
+        self.last_error: Optional[str] = None
+        # Lo ya extraído, por URL: sobrevive a los intentos fallidos
+        self._extracted: Dict[str, Any] = {}
+
+    async def _crawl(self) -> None:
+        listing = await _download_json(f"{POKEAPI_BASE_URL}/{self.kind}?limit=100000")
+        if listing is None:
+            raise RuntimeError(f"No se pudo obtener el listado de /{self.kind}")
+        urls = [item["url"] for item in listing["results"]]
+        pending = [url for url in urls if url not in self._extracted]
+        self.total = len(urls)
+        self.downloaded = len(urls) - len(pending)
+        
+        async def load(url: str) -> None:
+            data = await _download_json(url)
+            if data is None:
+                raise RuntimeError(f"la PokeAPI no devolvió {url}")
+            self._extracted[url] = self.extract(data)
+            self.downloaded += 1
+        
+        results, _ = await _map_bounded(load, pending)
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            raise RuntimeError(
+                f"{len(failures)} de {len(urls)} recursos de /{self.kind} no se pudieron descargar ({failures[0]})"
+            )
+        self.publish([self._extracted[url] for url in urls])
+        self._extracted = {}
+
+    def _done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        error = task.exception()
+        self.last_error = str(error) if error is not None else None
+
+    def building(self) -> IndexBuildingError:
+        """
+        Lanza la construcción si no está en marcha (o si el intento anterior
+        falló) y devuelve el error que explica la espera
+        """
+        previous_error = self.last_error
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._crawl())
+            self.task.add_done_callback(self._done)
+        message = (
+            f"{self.label} se está construyendo en segundo plano "
+            f"({self.downloaded}/{self.total or '?'} descargados); "
+            f"vuelve a intentarlo en unos minutos o configura POKEMON_SNAPSHOT para tenerlo al arrancar"
+        )
+        if previous_error:
+            message += f". El intento anterior falló: {previous_error}"
+        return IndexBuildingError(message)
+
+    def cancel(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "downloaded": self.downloaded,
+            "total": self.total,
+            "last_error": self.last_error,
+        }
+
+def _publish_pokemon_indexes(entries: List[Tuple[Tuple[int, str, List[int]], "LearnsetIndex.Entry"]]) -> None:
+    """Publica a la vez el almacén de estadísticas y el índice de aprendizajes"""
+    global _stats_store, _learnset_index
+    stats_rows = [stats_row for stats_row, _ in entries]
+    ids, names, rows = zip(*stats_rows) if stats_rows else ((), (), ())
+    _stats_store = StatsStore(list(ids), list(names), list(rows))
+    _learnset_index = LearnsetIndex([learnset for _, learnset in entries])
+
+# Un solo recorrido de /pokemon alimenta las estadísticas y los aprendizajes
+_pokemon_indexes_build = BackgroundIndexBuild(
+    "El índice de Pokémon", "pokemon",
+    lambda data: (StatsStore.row_from_payload(data), LearnsetIndex.entry_from_payload(data)),
+    _publish_pokemon_indexes,
+)
+
+async def _get_stats_store() -> StatsStore:
+    """
+    Devuelve el almacén de estadísticas.
+
+    Con snapshot se construye en memoria sin red la primera vez; sin snapshot
+    se construye en segundo plano y, mientras tanto, se lanza IndexBuildingError.
+    """
+    global _stats_store
+    if _stats_store is not None:
+        return _stats_store
+    snapshot = _get_snapshot()
+    if snapshot is not None and snapshot.resources.get("pokemon"):
+        _stats_store = StatsStore.from_payloads(snapshot.resources["pokemon"].values())
+        return _stats_store
+    raise _pokemon_indexes_build.building()
+
+async def _get_learnset_index() -> LearnsetIndex:
+    """
+    Devuelve el índice de aprendizajes: desde el snapshot la primera vez o,
+    sin snapshot, construido en segundo plano junto al almacén de
+    estadísticas (mientras tanto se lanza IndexBuildingError).
+    """
+    global _learnset_index
+    if _learnset_index is not None:
+        return _learnset_index
+    snapshot = _get_snapshot()
+    if snapshot is not None and snapshot.resources.get("pokemon"):
+        _learnset_index = LearnsetIndex.from_payloads(snapshot.resources["pokemon"].values())
+        return _learnset_index
+    raise _pokemon_indexes_build.building()
+
+_evolution_graph: Optional["EvolutionGraph"] = None
+
+def _publish_evolution_graph(chains: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+    """Construye el grafo con todas las cadenas y completa de paso el índice de cadenas"""
+    global _evolution_graph
+    graph = EvolutionGraph()
+    for chain_id, chain in chains:
+        graph.add_chain(chain)
+        if _evolution_index.get_by_chain(chain_id) is None:
+            _evolution_index.add_chain(chain_id, chain)
+    _evolution_graph = graph
+
+_evolution_graph_build = BackgroundIndexBuild(
+    "El grafo de evoluciones", "evolution-chain",
+    lambda data: (data["id"], data["chain"]),
+    _publish_evolution_graph,
+)
+
+async def _get_evolution_graph() -> "EvolutionGraph":
+    """
+    Devuelve el grafo de evoluciones: desde el snapshot la primera vez o, sin
+    snapshot, construido en segundo plano recorriendo /evolution-chain
+    (mientras tanto se lanza IndexBuildingError).
+    """
+    if _evolution_graph is not None:
+        return _evolution_graph
+    snapshot = _get_snapshot()
+    if snapshot is not None and snapshot.resources.get("evolution-chain"):
+        _publish_evolution_graph(
+            (chain_id, data["chain"]) for chain_id, data in snapshot.resources["evolution-chain"].items()
+        )
+        return _evolution_graph
+    raise _evolution_graph_build.building()
+
+_name_index: Optional[NameIndex] = None
+_name_index_lock = asyncio.Lock()
+# Momento del último intento fallido de construir el índice de nombres (se reintenta al minuto)
+_name_index_failed_at = 0.0
+_NAME_INDEX_RETRY_INTERVAL = 60.0
+
+async def _get_name_index() -> Optional[NameIndex]:
+    """
+    Devuelve el índice de nombres, construyéndolo la primera vez con dos
+    peticiones de listado (o desde el snapshot). Si la PokeAPI no responde
+    devuelve None y las herramientas siguen funcionando sin validación local.
+    """
+    global _name_index, _name_index_failed_at
+    if _name_index is not None:
+        return _name_index
+    if _name_index_failed_at and time.monotonic() - _name_index_failed_at < _NAME_INDEX_RETRY_INTERVAL:
+        return None
+    async with _name_index_lock:
+        if _name_index is None:
+            try:
+                pokemon_listing, species_listing = await asyncio.gather(
+                    _fetch_json(f"{POKEAPI_BASE_URL}/pokemon?limit=100000"),
+                    _fetch_json(f"{POKEAPI_BASE_URL}/pokemon-species?limit=100000")
+                )
+                if pokemon_listing is None or species_listing is None:
+                    raise RuntimeError("Listado de nombres no disponible")
+                _name_index = NameIndex.from_listings(pokemon_listing, species_listing)
+            except Exception:
+                _name_index_failed_at = time.monotonic()
+                return None
+    return _name_index
+
+async def _resolve_name(name_or_id: str, kind: str = "pokemon") -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Resuelve un nombre o ID al nombre canónico antes de consultar la API.
+
+    Devuelve (clave para la URL, None) o, si el nombre no existe, ("", error)
+    con sugerencias. Sin índice disponible se usa la entrada en minúsculas.
+    """
+    name_index = await _get_name_index()
+    if name_index is None:
+        return str(name_or_id).strip().lower(), None
+    
+    resolved = name_index.resolve(name_or_id, kind)
+    if resolved is not None:
+        return resolved, None
+    
+    label = "Pokémon" if kind == "pokemon" else "Especie de Pokémon"
+    suffix = "encontrado" if kind == "pokemon" else "encontrada"
+    return "", {
+        "error": f"{label} '{name_or_id}' no {suffix}",
+        "suggestions": [name.title() for name in name_index.suggest(name_or_id)]
+    }
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """
+    Abre el cliente HTTP (y carga el snapshot, si está configurado) al iniciar
+    el servidor y cierra los recursos al apagarlo
+    """
+    global _http_client
+    _http_client = _create_http_client()
+    if SNAPSHOT_PATH:
+        snapshot = await asyncio.to_thread(_get_snapshot)
+        _evolution_index.load_snapshot(snapshot)
+        await _get_stats_store()
+        await _get_evolution_graph()
+        await _get_learnset_index()
+        await _get_name_index()
+        snapshot.release_pokemon_payloads()
+    _schedule_random_pool_refill()
+    try:
+        yield {}
+    finally:
+        if _random_pool_task is not None:
+            _random_pool_task.cancel()
+        _pokemon_indexes_build.cancel()
+        _evolution_graph_build.cancel()
+        client, _http_client = _http_client, None
+        if client is not None:
+            await client.aclose()
+        if _persistent_cache is not None:
+            await asyncio.to_thread(_persistent_cache.close)
 
 # Inicializar FastMCP
-mcp = FastMCP("Pokemon MCP Server")
+mcp = FastMCP("Pokemon MCP Server", lifespan=lifespan)
 
 # Función auxiliar interna para obtener información de Pokémon (sin decorador MCP)
-async def _get_pokemon_data(name_or_id: str) -> Dict[str, Any]:
-    """Función auxiliar interna para obtener datos de Pokémon"""
+async def _get_pokemon_record(name_or_id: str) -> Tuple[Optional[PokemonRecord], Optional[Dict[str, Any]]]:
+    """Devuelve (registro, None) o, si algo falla, (None, error)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{POKEAPI_BASE_URL}/pokemon/{name_or_id.lower()}")
-            if response.status_code != 200:
-                return {"error": f"Pokémon '{name_or_id}' no encontrado"}
-            
-            pokemon_data = response.json()
-            
-            # Procesar tipos
-            types = [type_info["type"]["name"] for type_info in pokemon_data["types"]]
-            
-            # Procesar habilidades
-            abilities = [ability_info["ability"]["name"] for ability_info in pokemon_data["abilities"]]
-            
-            # Procesar estadísticas
-            stats = {}
-            for stat in pokemon_data["stats"]:
-                stat_name = stat["stat"]["name"].replace("-", "_")
-                stats[stat_name] = stat["base_stat"]
-            
-            # Procesar sprites
-            sprites = {
-                "front_default": pokemon_data["sprites"]["front_default"],
-                "front_shiny": pokemon_data["sprites"]["front_shiny"],
-                "back_default": pokemon_data["sprites"]["back_default"],
-                "back_shiny": pokemon_data["sprites"]["back_shiny"]
-            }
-            
-            return {
-                "id": pokemon_data["id"],
-                "name": pokemon_data["name"].title(),
-                "height": pokemon_data["height"] / 10,  # Convertir a metros
-                "weight": pokemon_data["weight"] / 10,  # Convertir a kg
-                "base_experience": pokemon_data["base_experience"],
-                "types": types,
-                "abilities": abilities,
-                "stats": stats,
-                "sprites": sprites
-            }
+        pokemon_key, error = await _resolve_name(name_or_id)
+        if error is not None:
+            return None, error
+        
+        record = await _fetch_json(f"{POKEAPI_BASE_URL}/pokemon/{pokemon_key}", "pokemon-summary")
+        if record is None:
+            return None, {"error": f"Pokémon '{name_or_id}' no encontrado"}
+        return record, None
     
     except Exception as e:
-        return {"error": f"Error al obtener información del Pokémon: {str(e)}"}
+        return None, {"error": f"Error al obtener información del Pokémon: {str(e)}"}
+
+async def _get_pokemon_data(name_or_id: str, fields: Optional[FieldSelection] = None) -> Dict[str, Any]:
+    """
+    Función auxiliar interna para obtener datos de Pokémon.
+
+    Con `fields` solo se construyen esos campos y, si bastan los índices en
+    memoria, no se consulta /pokemon: el ID y el nombre salen del índice de
+    nombres y las estadísticas del almacén de estadísticas (si ya existe).
+    """
+    if fields is not None and set(fields) <= {"id", "name", "stats"}:
+        try:
+            pokemon_key, error = await _resolve_name(name_or_id)
+        except Exception as e:
+            return {"error": f"Error al obtener información del Pokémon: {str(e)}"}
+        if error is not None:
+            return error
+        if "stats" not in fields:
+            name_index = await _get_name_index()
+            if name_index is not None and pokemon_key in name_index.pokemon:
+                known = {"id": name_index.pokemon[pokemon_key], "name": pokemon_key.title()}
+                return {field: known[field] for field in fields}
+        else:
+            row = _stats_store.row_of(pokemon_key) if _stats_store is not None else None
+            if row is not None:
+                known = _stats_store.record(row)
+                if fields["stats"] is not None:
+                    known["stats"] = {stat: known["stats"][stat] for stat in fields["stats"]}
+                return {field: known[field] for field in fields}
+    
+    record, error = await _get_pokemon_record(name_or_id)
+    return error if error is not None else record.to_dict(fields)
 
 @mcp.tool()
-async def get_pokemon_info(name_or_id: str) -> Dict[str, Any]:
+async def get_pokemon_info(name_or_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Obtiene información básica de un Pokémon por nombre o ID
     
     Args:
         name_or_id: Nombre o ID del Pokémon (ej: "pikachu", "25")
+        fields: Campos a devolver (ej: ["name", "types"] o ["stats.speed"]); los
+            demás no se calculan. Opciones: id, name, height, weight,
+            base_experience, types, abilities, stats, sprites (default: todos)
     
     Returns:
         Información básica del Pokémon incluyendo tipos, habilidades, estadísticas y sprites
     """
-    return await _get_pokemon_data(name_or_id)
+    try:
+        selection = _parse_fields(fields, POKEMON_FIELDS, POKEMON_SUBFIELDS)
+    except ValueError as e:
+        return {"error": str(e)}
+    return await _get_pokemon_data(name_or_id, selection)
+
+@mcp.tool()
+async def get_pokemon_info_batch(names_or_ids: List[str]) -> Dict[str, Any]:
+    """
+    Obtiene la información básica de varios Pokémon en una sola llamada
+    
+    Args:
+        names_or_ids: Lista de nombres o IDs (ej: ["pikachu", "6", "Charizard"]),
+            como máximo POKEMON_FANOUT_MAX_ITEMS (50 por defecto)
+    
+    Returns:
+        Un resultado por cada entrada, en el mismo orden; las entradas que fallan
+        contienen un campo "error"
+    """
+    try:
+        if len(names_or_ids) > FANOUT_MAX_ITEMS:
+            return {"error": f"Como máximo se pueden pedir {FANOUT_MAX_ITEMS} Pokémon por llamada "
+                             f"(se pidieron {len(names_or_ids)})"}
+        
+        # Las entradas repetidas (sin distinguir mayúsculas) se consultan una sola vez
+        keys = [str(name_or_id).strip().lower() for name_or_id in names_or_ids]
+        unique_keys = list(dict.fromkeys(keys))
+        
+        results, _ = await _map_bounded(_get_pokemon_data, unique_keys, timeout=FANOUT_TIMEOUT)
+        
+        by_key = {}
+        for key, result in zip(unique_keys, results):
+            if isinstance(result, asyncio.TimeoutError):
+                result = {"error": f"Tiempo de espera agotado para '{key}'"}
+            elif isinstance(result, BaseException):
+                result = {"error": f"Error al obtener información del Pokémon: {str(result)}"}
+            by_key[key] = result
+        
+        return {
+            "count": len(keys),
+            "unique": len(unique_keys),
+            "results": [by_key[key] for key in keys]
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al obtener información de los Pokémon: {str(e)}"}
+
+@mcp.tool()
+async def suggest_pokemon(query: str, limit: int = 10) -> Dict[str, Any]:
+    """
+    Sugiere nombres de Pokémon: autocompletado por prefijo y corrección de errores
+    
+    Args:
+        query: Texto escrito por el usuario (ej: "pika", "pikachuu", "mr mime")
+        limit: Número máximo de sugerencias (default: 10)
+    
+    Returns:
+        Nombre exacto si existe y lista de sugerencias
+    """
+    try:
+        name_index = await _get_name_index()
+        if name_index is None:
+            return {"error": "El índice de nombres no está disponible en este momento"}
+        
+        exact = name_index.resolve(query)
+        
+        return {
+            "query": query,
+            "exact_match": exact.title() if exact else None,
+            "suggestions": [name.title() for name in name_index.suggest(query, limit)]
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al sugerir Pokémon: {str(e)}"}
 
 @mcp.tool()
 async def get_pokemon_evolution_chain(pokemon_name: str) -> Dict[str, Any]:
@@ -112,215 +2800,858 @@ async def get_pokemon_evolution_chain(pokemon_name: str) -> Dict[str, Any]:
         Cadena de evolución completa del Pokémon
     """
     try:
-        async with httpx.AsyncClient() as client:
+        species_key, error = await _resolve_name(pokemon_name, "pokemon-species")
+        if error is not None:
+            return error
+        
+        evolution_chain = _evolution_index.get_by_species(species_key)
+        
+        if evolution_chain is None:
             # Obtener información de la especie
-            response = await client.get(f"{POKEAPI_BASE_URL}/pokemon-species/{pokemon_name.lower()}")
-            if response.status_code != 200:
+            species_data = await _fetch_json(f"{POKEAPI_BASE_URL}/pokemon-species/{species_key}")
+            if species_data is None:
                 return {"error": f"Especie de Pokémon '{pokemon_name}' no encontrada"}
             
-            species_data = response.json()
             evolution_chain_url = species_data["evolution_chain"]["url"]
+            chain_id = _id_from_url(evolution_chain_url)
+            evolution_chain = _evolution_index.get_by_chain(chain_id)
             
-            # Obtener cadena de evolución
-            evolution_response = await client.get(evolution_chain_url)
-            evolution_data = evolution_response.json()
+            if evolution_chain is None:
+                # Obtener cadena de evolución
+                evolution_data = await _fetch_json(evolution_chain_url)
+                if evolution_data is None:
+                    return {"error": f"Cadena de evolución de '{pokemon_name}' no encontrada"}
+                evolution_chain = _evolution_index.add_chain(evolution_data["id"], evolution_data["chain"])
             
-            def parse_evolution_chain(chain_data):
-                """Función recursiva para parsear la cadena de evolución"""
-                evolution_info = {
-                    "species": chain_data["species"]["name"],
-                    "min_level": None,
-                    "trigger": None,
-                    "evolves_to": []
-                }
-                
-                if chain_data["evolution_details"]:
-                    details = chain_data["evolution_details"][0]
-                    evolution_info["min_level"] = details.get("min_level")
-                    evolution_info["trigger"] = details["trigger"]["name"] if details["trigger"] else None
-                
-                for evolution in chain_data["evolves_to"]:
-                    evolution_info["evolves_to"].append(parse_evolution_chain(evolution))
-                
-                return evolution_info
-            
-            evolution_chain = parse_evolution_chain(evolution_data["chain"])
-            
-            return {
-                "pokemon": pokemon_name.title(),
-                "evolution_chain": evolution_chain
-            }
+            _evolution_index.add_alias(species_key, species_data["name"], species_data["id"], chain_id)
+        
+        return {
+            "pokemon": pokemon_name.title(),
+            "evolution_chain": evolution_chain
+        }
     
     except Exception as e:
         return {"error": f"Error al obtener cadena de evolución: {str(e)}"}
 
 @mcp.tool()
-async def search_pokemon_by_type(pokemon_type: str, limit: int = 10) -> Dict[str, Any]:
+async def find_evolutions_by_condition(trigger: Optional[str] = None, item: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Busca evoluciones por desencadenante y/o por objeto en todo el dex
+    
+    Args:
+        trigger: Desencadenante (ej: "trade", "level-up", "use-item", "shed")
+        item: Objeto usado o equipado (ej: "thunder-stone", "metal-coat")
+    
+    Returns:
+        Evoluciones (origen, destino y condiciones) que cumplen los filtros
+    """
+    try:
+        if not trigger and not item:
+            return {"error": "Indica al menos un desencadenante (trigger) o un objeto (item)"}
+        
+        graph = await _get_evolution_graph()
+        trigger_key = trigger.strip().lower().replace(" ", "-") if trigger else None
+        item_key = item.strip().lower().replace(" ", "-") if item else None
+        
+        # Partir del índice más selectivo y filtrar por el otro criterio
+        edges = graph.by_item.get(item_key, []) if item_key else graph.by_trigger.get(trigger_key, [])
+        if item_key and trigger_key:
+            edges = [
+                edge for edge in edges
+                if any(condition["trigger"] == trigger_key for condition in edge["conditions"])
+            ]
+        
+        return {
+            "trigger": trigger_key,
+            "item": item_key,
+            "count": len(edges),
+            "evolutions": edges
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al buscar evoluciones: {str(e)}"}
+
+@mcp.tool()
+async def get_pre_evolutions(pokemon_name: str) -> Dict[str, Any]:
+    """
+    Obtiene las pre-evoluciones de un Pokémon hasta la base de su familia
+    
+    Args:
+        pokemon_name: Nombre de la especie (ej: "charizard")
+    
+    Returns:
+        Pre-evoluciones, de la más cercana a la base, con las condiciones de cada paso
+    """
+    try:
+        species, error = await _resolve_name(pokemon_name, "pokemon-species")
+        if error is not None:
+            return error
+        
+        graph = await _get_evolution_graph()
+        if species not in graph.species:
+            return {"error": f"Especie de Pokémon '{pokemon_name}' no encontrada"}
+        
+        steps = graph.pre_evolutions(species)
+        
+        return {
+            "pokemon": pokemon_name.title(),
+            "base_species": steps[-1]["from"] if steps else species,
+            "pre_evolutions": [
+                {"species": step["from"], "evolves_to": step["to"], "conditions": step["conditions"]}
+                for step in steps
+            ]
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al obtener pre-evoluciones: {str(e)}"}
+
+@mcp.tool()
+async def get_final_forms_by_type(pokemon_type: str, include_single_stage: bool = False) -> Dict[str, Any]:
+    """
+    Obtiene las formas finales de evolución de un tipo
+    
+    Args:
+        pokemon_type: Tipo de Pokémon (ej: "fire", "water", "electric")
+        include_single_stage: Incluir también Pokémon que no evolucionan (default: False)
+    
+    Returns:
+        Especies del tipo que no evolucionan más, ordenadas por nombre
+    """
+    try:
+        graph = await _get_evolution_graph()
+        type_data = await _fetch_json(f"{POKEAPI_BASE_URL}/type/{pokemon_type.lower()}")
+        if type_data is None:
+            return {"error": f"Tipo '{pokemon_type}' no encontrado"}
+        
+        # /type lista Pokémon ("lycanroc-midday") y el grafo especies ("lycanroc"):
+        # cada Pokémon por defecto se traduce a su especie (mismo ID)
+        type_members = {pokemon_info["pokemon"]["name"] for pokemon_info in type_data["pokemon"]}
+        name_index = await _get_name_index()
+        if name_index is not None:
+            type_members = {
+                name_index.species_by_id[name_index.pokemon[name]]
+                for name in type_members
+                if name_index.pokemon.get(name) in name_index.species_by_id
+            }
+        final_forms = sorted(graph.final_forms(include_single_stage) & type_members)
+        
+        return {
+            "type": pokemon_type.title(),
+            "count": len(final_forms),
+            "final_forms": final_forms
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al obtener formas finales: {str(e)}"}
+
+@mcp.tool()
+async def search_pokemon_by_type(pokemon_type: str, limit: int = 10, enrich: bool = False,
+                                 timeout: Optional[float] = None,
+                                 fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Busca Pokémon por tipo
     
     Args:
         pokemon_type: Tipo de Pokémon (ej: "fire", "water", "electric")
         limit: Número máximo de Pokémon a retornar (default: 10)
+        enrich: Si es True, consulta /pokemon de cada resultado en lugar de derivar
+            ID y sprite de la respuesta del tipo (default: False)
+        timeout: Plazo máximo en segundos para obtener los detalles con enrich;
+            se devuelven los Pokémon que terminaron a tiempo (default: POKEMON_FANOUT_TIMEOUT)
+        fields: Campos de cada Pokémon (default: id, name y sprite). Admite
+            también los de get_pokemon_info (ej: ["name", "types"]); pedir
+            alguno que no sea id, name o sprite implica consultar /pokemon
     
     Returns:
         Lista de Pokémon del tipo especificado
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{POKEAPI_BASE_URL}/type/{pokemon_type.lower()}")
-            if response.status_code != 200:
-                return {"error": f"Tipo '{pokemon_type}' no encontrado"}
-            
-            type_data = response.json()
+        selection = _parse_fields(fields, ("sprite",) + POKEMON_FIELDS, POKEMON_SUBFIELDS)
+    except ValueError as e:
+        return {"error": str(e)}
+    
+    try:
+        type_data = await _fetch_json(f"{POKEAPI_BASE_URL}/type/{pokemon_type.lower()}")
+        if type_data is None:
+            return {"error": f"Tipo '{pokemon_type}' no encontrado"}
+        
+        entries = type_data["pokemon"][:limit]
+        
+        if selection is None:
+            selection = {"id": None, "name": None, "sprite": None}
+        elif not set(selection) <= {"id", "name", "sprite"}:
+            enrich = True
+        
+        if not enrich:
+            # La URL de cada Pokémon ya contiene su ID y el sprite se deriva del ID:
+            # una sola petición para toda la búsqueda
             pokemon_list = []
-            
-            for i, pokemon_info in enumerate(type_data["pokemon"][:limit]):
-                pokemon_name = pokemon_info["pokemon"]["name"]
-                
-                # Obtener información básica de cada Pokémon
-                pokemon_response = await client.get(f"{POKEAPI_BASE_URL}/pokemon/{pokemon_name}")
-                if pokemon_response.status_code == 200:
-                    pokemon_data = pokemon_response.json()
-                    pokemon_list.append({
-                        "id": pokemon_data["id"],
-                        "name": pokemon_data["name"].title(),
-                        "sprite": pokemon_data["sprites"]["front_default"]
-                    })
+            for pokemon_info in entries:
+                pokemon_id = _id_from_url(pokemon_info["pokemon"]["url"])
+                if pokemon_id is None:
+                    continue
+                pokemon = {"id": pokemon_id}
+                if "name" in selection:
+                    pokemon["name"] = pokemon_info["pokemon"]["name"].title()
+                if "sprite" in selection:
+                    pokemon["sprite"] = POKEAPI_SPRITE_URL.format(id=pokemon_id)
+                pokemon_list.append(pokemon)
             
             return {
                 "type": pokemon_type.title(),
                 "count": len(pokemon_list),
-                "pokemon": sorted(pokemon_list, key=lambda x: x["id"])
+                "timed_out": 0,
+                "pokemon": _project_fields(sorted(pokemon_list, key=lambda x: x["id"]), selection)
             }
+        
+        pokemon_names = [pokemon_info["pokemon"]["name"] for pokemon_info in entries]
+        
+        # Obtener información básica de cada Pokémon en paralelo
+        async def fetch_pokemon(pokemon_name):
+            return await _fetch_json(f"{POKEAPI_BASE_URL}/pokemon/{pokemon_name}", "pokemon-summary")
+        
+        results, timed_out = await _map_bounded(
+            fetch_pokemon, pokemon_names, timeout=FANOUT_TIMEOUT if timeout is None else timeout
+        )
+        
+        record_fields = {field: subfields for field, subfields in selection.items() if field != "sprite"}
+        record_fields["id"] = None
+        pokemon_list = []
+        for record in results:
+            if record is None or isinstance(record, BaseException):
+                continue
+            pokemon = record.to_dict(record_fields)
+            if "sprite" in selection:
+                pokemon["sprite"] = record.sprites[0]
+            pokemon_list.append(pokemon)
+        
+        return {
+            "type": pokemon_type.title(),
+            "count": len(pokemon_list),
+            "timed_out": timed_out,
+            "pokemon": _project_fields(sorted(pokemon_list, key=lambda x: x["id"]), selection)
+        }
     
     except Exception as e:
         return {"error": f"Error al buscar Pokémon por tipo: {str(e)}"}
 
+def _project_fields(items: List[Dict[str, Any]], selection: FieldSelection) -> List[Dict[str, Any]]:
+    """Deja en cada elemento solo los campos pedidos, en el orden en que se pidieron"""
+    return [{field: item[field] for field in selection} for item in items]
+
+# Pokémon aleatorios ya obtenidos, listos para servirse sin esperar a la red
+_random_pool: "deque[PokemonRecord]" = deque()
+_random_pool_task: Optional[asyncio.Task] = None
+
+_ROMAN_GENERATIONS = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8, "ix": 9}
+
+def _generation_number(generation: Any) -> Optional[int]:
+    """Acepta 1, "1", "iv" o "generation-iv" y devuelve el número de generación"""
+    key = str(generation).strip().lower().removeprefix("generation-")
+    if key.isdigit():
+        return int(key)
+    return _ROMAN_GENERATIONS.get(key)
+
+async def _random_pokemon_ids() -> List[int]:
+    """IDs válidos de todos los Pokémon (formas alternativas incluidas), desde el índice de nombres"""
+    name_index = await _get_name_index()
+    if name_index is None:
+        raise RuntimeError("Listado de Pokémon no disponible")
+    return sorted(name_index.pokemon_by_id)
+
+async def _generation_species_ids(generation: int) -> Optional[set]:
+    """IDs de las especies de una generación: del snapshot si lo hay o de /generation"""
+    snapshot = _get_snapshot()
+    if snapshot is not None and snapshot.resources.get("pokemon-species"):
+        return {
+            species_id for species_id, species in snapshot.resources["pokemon-species"].items()
+            if _id_from_url((species.get("generation") or {}).get("url") or "") == generation
+        }
+    generation_data = await _fetch_json(f"{POKEAPI_BASE_URL}/generation/{generation}")
+    if generation_data is None:
+        return None
+    return {
+        species_id for species in generation_data["pokemon_species"]
+        if (species_id := _id_from_url(species["url"])) is not None
+    }
+
+async def _fill_random_pool() -> None:
+    """Rellena la reserva de Pokémon aleatorios hasta RANDOM_POOL_SIZE"""
+    ids = await _random_pokemon_ids()
+    while len(_random_pool) < RANDOM_POOL_SIZE:
+        pooled = {record.id for record in _random_pool}
+        candidates = [pokemon_id for pokemon_id in ids if pokemon_id not in pooled]
+        if not candidates:
+            return
+        batch = random.sample(candidates, min(RANDOM_POOL_SIZE - len(_random_pool), len(candidates)))
+        results, _ = await _map_bounded(_get_pokemon_record, [str(pokemon_id) for pokemon_id in batch],
+                                        timeout=FANOUT_TIMEOUT)
+        ready = [result[0] for result in results if isinstance(result, tuple) and result[0] is not None]
+        if not ready:
+            return
+        _random_pool.extend(ready[:RANDOM_POOL_SIZE - len(_random_pool)])
+
+def _schedule_random_pool_refill() -> None:
+    """Lanza en segundo plano el relleno de la reserva si no hay uno en curso"""
+    global _random_pool_task
+    if RANDOM_POOL_SIZE <= 0 or len(_random_pool) >= RANDOM_POOL_SIZE:
+        return
+    if _random_pool_task is not None and not _random_pool_task.done():
+        return
+    _random_pool_task = asyncio.create_task(_fill_random_pool())
+    # Un fallo de red solo deja la reserva a medias; se reintenta en la siguiente llamada
+    _random_pool_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
 @mcp.tool()
-async def get_random_pokemon() -> Dict[str, Any]:
+async def get_random_pokemon(count: int = 1, pokemon_type: Optional[str] = None,
+                             generation: Optional[str] = None,
+                             min_stats: Optional[Dict[str, int]] = None,
+                             max_stats: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
     """
-    Obtiene un Pokémon aleatorio
+    Obtiene uno o varios Pokémon aleatorios distintos
+    
+    Args:
+        count: Número de Pokémon distintos a obtener, como máximo
+            POKEMON_FANOUT_MAX_ITEMS (default: 1)
+        pokemon_type: Solo Pokémon de este tipo (opcional)
+        generation: Solo Pokémon de esta generación, ej: 1, "iv" o "generation-iv" (opcional)
+        min_stats: Valores mínimos inclusivos por estadística (opcional)
+        max_stats: Valores máximos inclusivos por estadística (opcional)
     
     Returns:
-        Información de un Pokémon seleccionado aleatoriamente
+        Con count=1, la información de un Pokémon seleccionado aleatoriamente;
+        con count>1, la lista de Pokémon y el número de candidatos
     """
-    import random
-    
     try:
-        # Generar un ID aleatorio (hay aproximadamente 1010 Pokémon)
-        random_id = random.randint(1, 1010)
-        return await _get_pokemon_data(str(random_id))
+        if count < 1:
+            return {"error": "count debe ser mayor o igual que 1"}
+        if count > FANOUT_MAX_ITEMS:
+            return {"error": f"count no puede ser mayor que {FANOUT_MAX_ITEMS}"}
+        
+        # El universo son los IDs que existen de verdad: nunca se pide un ID inválido
+        candidates = set(await _random_pokemon_ids())
+        if pokemon_type:
+            type_data = await _fetch_json(f"{POKEAPI_BASE_URL}/type/{pokemon_type.lower()}")
+            if type_data is None:
+                return {"error": f"Tipo '{pokemon_type}' no encontrado"}
+            candidates &= {_id_from_url(entry["pokemon"]["url"]) for entry in type_data["pokemon"]}
+        if generation is not None:
+            generation_number = _generation_number(generation)
+            species_ids = await _generation_species_ids(generation_number) if generation_number else None
+            if species_ids is None:
+                return {"error": f"Generación '{generation}' no encontrada"}
+            name_index = await _get_name_index()
+            candidates = {
+                pokemon_id for pokemon_id in candidates
+                if name_index.species_id_of(pokemon_id) in species_ids
+            }
+        if min_stats or max_stats:
+            store = await _get_stats_store()
+            candidates &= {int(store.ids[row]) for row in store.filter(min_stats or {}, max_stats or {})}
+        
+        if not candidates:
+            return {"error": "Ningún Pokémon cumple los filtros indicados"}
+        
+        # Primero los Pokémon de la reserva que cumplan los filtros; el resto se pide por ID
+        selected = []
+        for record in list(_random_pool):
+            if len(selected) >= count:
+                break
+            if record.id in candidates:
+                _random_pool.remove(record)
+                selected.append(record.to_dict())
+        remaining = list(candidates - {info["id"] for info in selected})
+        random.shuffle(remaining)
+        while len(selected) < count and remaining:
+            batch, remaining = remaining[:count - len(selected)], remaining[count - len(selected):]
+            results, _ = await _map_bounded(_get_pokemon_data, [str(pokemon_id) for pokemon_id in batch],
+                                            timeout=FANOUT_TIMEOUT)
+            selected.extend(info for info in results if isinstance(info, dict) and "error" not in info)
+        _schedule_random_pool_refill()
+        
+        if not selected:
+            return {"error": "No se pudo obtener ningún Pokémon aleatorio"}
+        random.shuffle(selected)
+        if count == 1:
+            return selected[0]
+        return {
+            "total_candidates": len(candidates),
+            "count": len(selected),
+            "pokemon": selected
+        }
     
     except Exception as e:
         return {"error": f"Error al obtener Pokémon aleatorio: {str(e)}"}
 
 @mcp.tool()
-async def compare_pokemon_stats(pokemon1: str, pokemon2: str) -> Dict[str, Any]:
+async def compare_pokemon_stats(pokemon1: str, pokemon2: str,
+                                others: Optional[List[str]] = None,
+                                fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """
-    Compara las estadísticas de dos Pokémon
+    Compara las estadísticas de dos o más Pokémon
     
     Args:
         pokemon1: Nombre o ID del primer Pokémon
         pokemon2: Nombre o ID del segundo Pokémon
+        others: Nombres o IDs de Pokémon adicionales a comparar (opcional)
+        fields: Estadísticas a comparar (ej: ["speed", "attack"]); "total" incluye
+            el total. Opciones: hp, attack, defense, special_attack,
+            special_defense, speed, total (default: todas)
     
     Returns:
-        Comparación detallada de estadísticas entre ambos Pokémon
+        Comparación detallada de estadísticas: ganador y ranking por estadística
+        y total de estadísticas de cada Pokémon. Si un Pokémon aparece dos veces
+        (por nombre o por ID) se devuelve un error
     """
     try:
-        # Obtener información de ambos Pokémon
-        pokemon1_info = await _get_pokemon_data(pokemon1)
-        pokemon2_info = await _get_pokemon_data(pokemon2)
-        
-        if "error" in pokemon1_info:
-            return pokemon1_info
-        if "error" in pokemon2_info:
-            return pokemon2_info
-        
-        # Comparar estadísticas
-        comparison = {
-            "pokemon1": {
-                "name": pokemon1_info["name"],
-                "id": pokemon1_info["id"],
-                "stats": pokemon1_info["stats"]
-            },
-            "pokemon2": {
-                "name": pokemon2_info["name"],
-                "id": pokemon2_info["id"],
-                "stats": pokemon2_info["stats"]
-            },
-            "winner_by_stat": {}
-        }
+        selection = _parse_fields(fields, StatsStore.COLUMNS)
+    except ValueError as e:
+        return {"error": str(e)}
+    
+    try:
+        stat_names = [stat for stat in STAT_NAMES if selection is None or stat in selection]
+        include_total = selection is None or "total" in selection
         
-        # Determinar ganador por estadística
-        for stat_name in pokemon1_info["stats"]:
-            stat1 = pokemon1_info["stats"][stat_name]
-            stat2 = pokemon2_info["stats"][stat_name]
-            
-            if stat1 > stat2:
-                comparison["winner_by_stat"][stat_name] = pokemon1_info["name"]
-            elif stat2 > stat1:
-                comparison["winner_by_stat"][stat_name] = pokemon2_info["name"]
-            else:
-                comparison["winner_by_stat"][stat_name] = "Empate"
+        # Obtener información de todos los Pokémon en paralelo (solo ID, nombre y estadísticas)
+        names = [pokemon1, pokemon2] + list(others or [])
+        results, _ = await _map_bounded(
+            partial(_get_pokemon_data, fields={"id": None, "name": None, "stats": None}),
+            names, timeout=FANOUT_TIMEOUT
+        )
+        
+        participants = []
+        seen_ids = set()
+        for name, info in zip(names, results):
+            if isinstance(info, asyncio.TimeoutError):
+                return {"error": f"Tiempo de espera agotado para '{name}'"}
+            if isinstance(info, BaseException):
+                raise info
+            if "error" in info:
+                return info
+            # Los rankings y total_stats van por nombre: un Pokémon repetido se pisaría
+            if info["id"] in seen_ids:
+                return {"error": f"{info['name']} aparece más de una vez en la comparación; compara Pokémon distintos"}
+            seen_ids.add(info["id"])
+            participant = {
+                "name": info["name"],
+                "id": info["id"],
+                "stats": {stat_name: info["stats"][stat_name] for stat_name in stat_names}
+            }
+            if include_total:
+                participant["total"] = sum(info["stats"].values())
+            participants.append(participant)
         
-        # Calcular total de estadísticas
-        total1 = sum(pokemon1_info["stats"].values())
-        total2 = sum(pokemon2_info["stats"].values())
+        # Ganador y ranking por estadística (el total se trata como una estadística más)
+        winner_by_stat = {}
+        rankings = {}
+        for stat_name in stat_names + (["total"] if include_total else []):
+            values = [
+                (participant["total"] if stat_name == "total" else participant["stats"][stat_name], participant["name"])
+                for participant in participants
+            ]
+            values.sort(key=lambda value: value[0], reverse=True)
+            rankings[stat_name] = [name for _, name in values]
+            winner_by_stat[stat_name] = "Empate" if values[0][0] == values[1][0] else values[0][1]
         
-        comparison["total_stats"] = {
-            pokemon1_info["name"]: total1,
-            pokemon2_info["name"]: total2,
-            "winner": pokemon1_info["name"] if total1 > total2 else pokemon2_info["name"] if total2 > total1 else "Empate"
+        result = {
+            "pokemon1": {key: participants[0][key] for key in ("name", "id", "stats")},
+            "pokemon2": {key: participants[1][key] for key in ("name", "id", "stats")},
+            "participants": participants,
+            "winner_by_stat": winner_by_stat,
+            "rankings": rankings
         }
-        
-        return comparison
+        if include_total:
+            total_stats = {participant["name"]: participant["total"] for participant in participants}
+            total_stats["winner"] = winner_by_stat.pop("total")
+            result["total_stats"] = total_stats
+        return result
     
     except Exception as e:
         return {"error": f"Error al comparar Pokémon: {str(e)}"}
 
+# Detalles de movimientos ya resumidos, compartidos por todos los Pokémon.
+# El número de movimientos está acotado (~900), así que no se expulsan entradas.
+_move_details: Dict[str, MoveRecord] = {}
+
+async def _get_move_details(move_name: str) -> Optional[MoveRecord]:
+    """Obtiene potencia, precisión, PP, tipo y clase de daño de un movimiento"""
+    details = _move_details.get(move_name)
+    if details is not None:
+        return details
+    
+    details = await _fetch_json(f"{POKEAPI_BASE_URL}/move/{move_name}", "move-details")
+    if details is None:
+        return None
+    
+    _move_details[move_name] = details
+    return details
+
 @mcp.tool()
-async def get_pokemon_moves(pokemon_name: str, limit: int = 10) -> Dict[str, Any]:
+async def get_pokemon_moves(pokemon_name: str, limit: int = 10, enrich: bool = False,
+                            version_group: Optional[str] = None, learn_method: Optional[str] = None,
+                            sort_by_level: bool = False) -> Dict[str, Any]:
     """
     Obtiene los movimientos que puede aprender un Pokémon
     
     Args:
         pokemon_name: Nombre del Pokémon
         limit: Número máximo de movimientos a mostrar (default: 10)
+        enrich: Añade potencia, precisión, PP, tipo y clase de daño de cada movimiento (default: False)
+        version_group: Solo movimientos de este grupo de versiones (ej: "red-blue", "scarlet-violet")
+        learn_method: Solo movimientos aprendidos así (ej: "level-up", "machine", "egg", "tutor")
+        sort_by_level: Ordena por nivel de aprendizaje (default: False)
     
     Returns:
         Lista de movimientos del Pokémon
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{POKEAPI_BASE_URL}/pokemon/{pokemon_name.lower()}")
-            if response.status_code != 200:
+        pokemon_key, error = await _resolve_name(pokemon_name)
+        if error is not None:
+            return error
+        
+        # Si el índice de aprendizajes ya está construido no hace falta descargar /pokemon
+        pokemon_code = _learnset_index.pokemon_code(pokemon_key) if _learnset_index is not None else None
+        if pokemon_code is not None:
+            learnset = _learnset_index.learnset(pokemon_code)
+        else:
+            pokemon_data = await _fetch_json(f"{POKEAPI_BASE_URL}/pokemon/{pokemon_key}")
+            if pokemon_data is None:
                 return {"error": f"Pokémon '{pokemon_name}' no encontrado"}
+            learnset = [
+                (
+                    move_info["move"]["name"],
+                    [
+                        (details["version_group"]["name"], details["move_learn_method"]["name"], details["level_learned_at"])
+                        for details in move_info["version_group_details"]
+                    ]
+                )
+                for move_info in pokemon_data["moves"]
+            ]
+        
+        version_group_key = version_group.strip().lower().replace(" ", "-") if version_group else None
+        learn_method_key = learn_method.strip().lower().replace(" ", "-") if learn_method else None
+        
+        moves_list = []
+        move_names = []
+        
+        for move_name, move_details in learnset:
+            # Primer detalle (grupo de versiones, método, nivel) que cumple los filtros
+            details = next(
+                (
+                    details for details in move_details
+                    if (version_group_key is None or details[0] == version_group_key)
+                    and (learn_method_key is None or details[1] == learn_method_key)
+                ),
+                None
+            )
+            if details is None and (version_group_key or learn_method_key):
+                continue
             
-            pokemon_data = response.json()
-            moves_list = []
-            
-            for move_info in pokemon_data["moves"][:limit]:
-                move_name = move_info["move"]["name"]
-                learn_method = move_info["version_group_details"][0]["move_learn_method"]["name"] if move_info["version_group_details"] else "unknown"
-                level_learned = move_info["version_group_details"][0]["level_learned_at"] if move_info["version_group_details"] else None
-                
-                moves_list.append({
-                    "name": move_name.replace("-", " ").title(),
-                    "learn_method": learn_method.replace("-", " ").title(),
-                    "level_learned": level_learned
-                })
+            move_learn_method = details[1] if details else "unknown"
             
-            return {
-                "pokemon": pokemon_name.title(),
-                "total_moves": len(pokemon_data["moves"]),
-                "moves_shown": len(moves_list),
-                "moves": moves_list
-            }
+            moves_list.append({
+                "name": move_name.replace("-", " ").title(),
+                "learn_method": move_learn_method.replace("-", " ").title(),
+                "level_learned": details[2] if details else None,
+                "version_group": details[0] if details else None
+            })
+            move_names.append(move_name)
+        
+        matching_moves = len(moves_list)
+        if sort_by_level:
+            order = sorted(
+                range(len(moves_list)),
+                key=lambda index: (moves_list[index]["level_learned"] is None, moves_list[index]["level_learned"] or 0)
+            )
+            moves_list = [moves_list[index] for index in order]
+            move_names = [move_names[index] for index in order]
+        moves_list = moves_list[:limit]
+        move_names = move_names[:limit]
+        
+        if enrich:
+            # Detalles de los movimientos en paralelo, casi siempre desde la caché de movimientos
+            results, _ = await _map_bounded(_get_move_details, move_names, timeout=FANOUT_TIMEOUT)
+            for move, move_details in zip(moves_list, results):
+                if isinstance(move_details, MoveRecord):
+                    move.update(move_details.to_dict())
+        
+        return {
+            "pokemon": pokemon_name.title(),
+            "total_moves": len(learnset),
+            "matching_moves": matching_moves,
+            "moves_shown": len(moves_list),
+            "moves": moves_list
+        }
     
     except Exception as e:
         return {"error": f"Error al obtener movimientos: {str(e)}"}
 
+@mcp.tool()
+async def find_pokemon_learning_move(move_name: str, version_group: Optional[str] = None,
+                                     learn_method: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Busca los Pokémon que pueden aprender un movimiento
+    
+    Args:
+        move_name: Nombre del movimiento (ej: "thunderbolt", "surf")
+        version_group: Solo en este grupo de versiones (ej: "red-blue", "scarlet-violet")
+        learn_method: Solo con este método (ej: "level-up", "machine", "egg", "tutor")
+        limit: Número máximo de Pokémon a retornar (default: 100)
+    
+    Returns:
+        Pokémon que aprenden el movimiento con sus métodos y el nivel mínimo por level-up
+    """
+    try:
+        index = await _get_learnset_index()
+        normalize = lambda value: value.strip().lower().replace(" ", "-") if value else None
+        pokemon_list = index.pokemon_learning(normalize(move_name), normalize(version_group), normalize(learn_method))
+        
+        return {
+            "move": move_name.replace("-", " ").title(),
+            "total_matches": len(pokemon_list),
+            "count": min(len(pokemon_list), limit),
+            "pokemon": pokemon_list[:limit]
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al buscar Pokémon por movimiento: {str(e)}"}
+
+@mcp.tool()
+async def get_moves_learned_by_level(pokemon_name: str, max_level: int,
+                                     version_group: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Obtiene los movimientos que un Pokémon aprende subiendo de nivel hasta un nivel dado
+    
+    Args:
+        pokemon_name: Nombre o ID del Pokémon
+        max_level: Nivel máximo (inclusive)
+        version_group: Solo en este grupo de versiones (ej: "scarlet-violet")
+    
+    Returns:
+        Movimientos por level-up hasta max_level, ordenados por nivel
+    """
+    try:
+        pokemon_key, error = await _resolve_name(pokemon_name)
+        if error is not None:
+            return error
+        
+        index = await _get_learnset_index()
+        pokemon_code = index.pokemon_code(pokemon_key)
+        if pokemon_code is None:
+            return {"error": f"Pokémon '{pokemon_name}' no encontrado"}
+        
+        version_group_key = version_group.strip().lower().replace(" ", "-") if version_group else None
+        moves_list = index.moves_by_level(pokemon_code, max_level, version_group_key)
+        
+        return {
+            "pokemon": index.pokemon_names[pokemon_code].title(),
+            "max_level": max_level,
+            "count": len(moves_list),
+            "moves": moves_list
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al obtener movimientos por nivel: {str(e)}"}
+
+@mcp.tool()
+async def get_top_pokemon_by_stat(stat: str = "total", n: int = 10, ascending: bool = False) -> Dict[str, Any]:
+    """
+    Obtiene los Pokémon con el valor más alto (o más bajo) de una estadística base
+    
+    Args:
+        stat: Estadística a ordenar: hp, attack, defense, special_attack,
+            special_defense, speed o total (default: "total")
+        n: Número de Pokémon a retornar (default: 10)
+        ascending: Si es True devuelve los valores más bajos (default: False)
+    
+    Returns:
+        Ranking de Pokémon por la estadística indicada
+    """
+    try:
+        store = await _get_stats_store()
+        column = StatsStore.column_name(stat)
+        ranking = [store.record(row) for row in store.top(column, n, ascending)]
+        
+        return {
+            "stat": column,
+            "order": "ascendente" if ascending else "descendente",
+            "count": len(ranking),
+            "pokemon": ranking
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al obtener el ranking de estadísticas: {str(e)}"}
+
+@mcp.tool()
+async def get_pokemon_stat_percentiles(name_or_id: str) -> Dict[str, Any]:
+    """
+    Calcula el percentil de cada estadística base de un Pokémon frente a todo el dex
+    
+    Args:
+        name_or_id: Nombre o ID del Pokémon (ej: "pikachu", "25")
+    
+    Returns:
+        Estadísticas del Pokémon y su percentil (0-100) en cada una
+    """
+    try:
+        pokemon_key, error = await _resolve_name(name_or_id)
+        if error is not None:
+            return error
+        
+        store = await _get_stats_store()
+        row = store.row_of(pokemon_key)
+        if row is None:
+            return {"error": f"Pokémon '{name_or_id}' no encontrado"}
+        
+        result = store.record(row)
+        result["percentiles"] = store.percentiles(row)
+        result["compared_with"] = len(store)
+        return result
+    
+    except Exception as e:
+        return {"error": f"Error al calcular percentiles: {str(e)}"}
+
+@mcp.tool()
+async def filter_pokemon_by_stats(min_stats: Optional[Dict[str, int]] = None,
+                                  max_stats: Optional[Dict[str, int]] = None,
+                                  limit: int = 50) -> Dict[str, Any]:
+    """
+    Busca Pokémon cuyas estadísticas base están dentro de los rangos indicados
+    
+    Args:
+        min_stats: Valores mínimos inclusivos por estadística (ej: {"speed": 101, "attack": 121})
+        max_stats: Valores máximos inclusivos por estadística (ej: {"hp": 60})
+        limit: Número máximo de Pokémon a retornar (default: 50)
+    
+    Returns:
+        Pokémon que cumplen todos los rangos, ordenados por ID
+    """
+    try:
+        store = await _get_stats_store()
+        rows = store.filter(min_stats or {}, max_stats or {})
+        
+        return {
+            "total_matches": len(rows),
+            "count": min(len(rows), limit),
+            "pokemon": [store.record(row) for row in rows[:limit]]
+        }
+    
+    except Exception as e:
+        return {"error": f"Error al filtrar Pokémon por estadísticas: {str(e)}"}
+
+@mcp.tool()
+async def get_server_stats() -> Dict[str, Any]:
+    """
+    Obtiene métricas internas del servidor
+    
+    Returns:
+        Estadísticas de las cachés (en memoria, persistente e índices internos),
+        de las peticiones agrupadas (single-flight), de las peticiones a la
+        PokeAPI (circuit breaker y reintentos) y del snapshot (si está activo)
+    """
+    persistent_stats = None
+    if _persistent_cache is not None:
+        persistent_stats = await asyncio.to_thread(_persistent_cache.stats)
+    
+    return {
+        "cache": _response_cache.stats(),
+        "persistent_cache": persistent_stats,
+        "negative_cache": _negative_cache.stats(),
+        "single_flight": _upstream_flights.stats(),
+        "upstream": {
+            "circuit_breaker": _circuit_breaker.stats(),
+            "rate_limiter": _rate_limiter.stats(),
+            "concurrency": _concurrency_limiter.stats(),
+            "hedging": _hedging.stats() if HEDGE_ENABLED else None,
+            "retries": _retry_policy.stats(),
+            **_upstream_counters,
+        },
+        "evolution_index": _evolution_index.stats(),
+        "evolution_graph": _evolution_graph.stats() if _evolution_graph is not None else None,
+        "move_details": {"entries": len(_move_details)},
+        "learnset_index": _learnset_index.stats() if _learnset_index is not None else None,
+        "pokemon_indexes_build": _pokemon_indexes_build.stats(),
+        "evolution_graph_build": _evolution_graph_build.stats(),
+        "name_index": _name_index.stats() if _name_index is not None else None,
+        "random_pool": {"entries": len(_random_pool), "max_entries": RANDOM_POOL_SIZE},
+        "snapshot": _snapshot.stats() if _snapshot is not None else None
+    }
+
+async def _download_json(url: str) -> Optional[Dict[str, Any]]:
+    """Descarga una URL directamente de la PokeAPI, sin cachés (para el snapshot)"""
+    response = await _get_with_retries(url)
+    if response.status_code != 200:
+        return None
+    return _json_loads(response.content)
+
+async def _crawl_snapshot(concurrency: int) -> PokedexSnapshot:
+    """Descarga todos los recursos de los tipos incluidos en el snapshot"""
+    resources: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    for kind in PokedexSnapshot.KINDS:
+        listing = await _download_json(f"{POKEAPI_BASE_URL}/{kind}?limit=100000")
+        if listing is None:
+            raise RuntimeError(f"No se pudo obtener el listado de /{kind}")
+        urls = [item["url"] for item in listing["results"]]
+        results, _ = await _map_bounded(_download_json, urls, concurrency=concurrency)
+        
+        items = {}
+        failed = 0
+        for data in results:
+            if data is None or isinstance(data, BaseException):
+                failed += 1
+                continue
+            items[data["id"]] = PokedexSnapshot.compact(kind, data)
+        resources[kind] = items
+        print(f"/{kind}: {len(items)} recursos ({failed} fallidos)", file=sys.stderr)
+    return PokedexSnapshot(resources, time.time())
+
+def _read_snapshot_dir(directory: str) -> PokedexSnapshot:
+    """
+    Construye un snapshot desde un volcado local con la estructura de
+    PokeAPI/api-data: <directorio>/<tipo>/<id>/index.json
+    """
+    root = os.path.expanduser(directory)
+    if os.path.isdir(os.path.join(root, "api", "v2")):
+        root = os.path.join(root, "api", "v2")
+    
+    resources: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    for kind in PokedexSnapshot.KINDS:
+        items = {}
+        kind_dir = os.path.join(root, kind)
+        for entry in os.listdir(kind_dir) if os.path.isdir(kind_dir) else []:
+            index_path = os.path.join(kind_dir, entry, "index.json")
+            if entry.isdigit() and os.path.isfile(index_path):
+                with open(index_path, encoding="utf-8") as resource_file:
+                    items[int(entry)] = PokedexSnapshot.compact(kind, json.load(resource_file))
+        resources[kind] = items
+        print(f"/{kind}: {len(items)} recursos", file=sys.stderr)
+    return PokedexSnapshot(resources, time.time())
+
+async def _build_snapshot(output: str, from_dir: Optional[str], concurrency: int) -> None:
+    """Genera el fichero de snapshot desde la PokeAPI o desde un volcado local"""
+    if from_dir:
+        snapshot = _read_snapshot_dir(from_dir)
+    else:
+        try:
+            snapshot = await _crawl_snapshot(concurrency)
+        finally:
+            await _get_http_client().aclose()
+    snapshot.save(output)
+    print(f"Snapshot guardado en {output}", file=sys.stderr)
+
 if __name__ == "__main__":
-    # Ejecutar el servidor MCP
-    mcp.run()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Servidor MCP de Pokémon")
+    subcommands = parser.add_subparsers(dest="command")
+    snapshot_parser = subcommands.add_parser("snapshot", help="Genera un snapshot local de la PokeAPI")
+    snapshot_parser.add_argument("--output", required=True, help="Fichero de salida (.json.gz)")
+    snapshot_parser.add_argument("--from-dir", help="Volcado local con la estructura de PokeAPI/api-data")
+    snapshot_parser.add_argument("--concurrency", type=int, default=20, help="Descargas simultáneas (default: 20)")
+    args = parser.parse_args()
+    
+    if args.command == "snapshot":
+        asyncio.run(_build_snapshot(args.output, args.from_dir, args.concurrency))
+    else:
+        # Ejecutar el servidor MCP
+        mcp.run()
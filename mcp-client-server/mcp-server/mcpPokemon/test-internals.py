@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Pruebas sin red de las piezas internas del servidor: políticas de expulsión
+y presupuestos de la caché, caché persistente en SQLite, sketch de frecuencias, reintentos, circuit
+breaker, peticiones de cobertura, concurrencia adaptativa, almacén de
+estadísticas, índice de aprendizajes, índice de nombres y
+selección de campos.
+
+Uso: python test-internals.py
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from index import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    EVICTION_POLICIES,
+    EvictionPolicy,
+    FrequencySketch,
+    HedgingPolicy,
+    LearnsetIndex,
+    NameIndex,
+    POKEMON_FIELDS,
+    POKEMON_SUBFIELDS,
+    PokemonRecord,
+    ResponseCache,
+    RetryPolicy,
+    SQLiteCache,
+    StatsStore,
+    _parse_fields,
+)
+
+KINDS = ("pokemon", "pokemon-species", "move", "type")
+
+def check_cache_invariants(cache: ResponseCache) -> None:
+    """Comprueba que la contabilidad de la caché cuadra con sus entradas"""
+    entries_by_kind = {}
+    bytes_by_kind = {}
+    for key, (_, size, _, _, kind) in cache._entries.items():
+        entries_by_kind.setdefault(kind, set()).add(key)
+        bytes_by_kind[kind] = bytes_by_kind.get(kind, 0) + size
+
+    # Cada política sigue exactamente las claves de su tipo
+    for kind, policy in cache._policies.items():
+        keys = list(policy.keys())
+        assert len(keys) == len(set(keys)), f"{kind}: claves duplicadas en la política"
+        assert set(keys) == entries_by_kind.get(kind, set()), f"{kind}: la política no coincide con la caché"
+
+    # Los bytes por tipo suman el total y respetan los presupuestos
+    assert cache._bytes_by_kind == bytes_by_kind, (cache._bytes_by_kind, bytes_by_kind)
+    assert cache._bytes == sum(bytes_by_kind.values())
+    assert cache._entries_by_kind == {kind: len(keys) for kind, keys in entries_by_kind.items()}
+    assert cache._bytes <= cache.max_bytes
+    assert len(cache._entries) <= cache.max_entries
+    for kind, budget in cache.max_bytes_by_kind.items():
+        assert bytes_by_kind.get(kind, 0) <= budget, f"{kind}: presupuesto superado"
+
+def test_cache_fuzz():
+    """Operaciones aleatorias sobre la caché con cada política"""
+    print("🧪 Probando invariantes de la caché (fuzz)...")
+
+    for policy in EVICTION_POLICIES:
+        for seed in range(20):
+            rng = random.Random(seed)
+            budgets = {kind: rng.randint(200, 2000) for kind in rng.sample(KINDS, rng.randint(0, 2))}
+            cache = ResponseCache(
+                max_entries=rng.randint(5, 60), max_bytes=rng.randint(500, 5000),
+                ttl_by_kind={}, default_ttl=60, policy=policy, max_bytes_by_kind=budgets
+            )
+            for _ in range(2000):
+                key = f"k{rng.randint(0, 80)}"
+                kind = KINDS[int(key[1:]) % len(KINDS)]
+                operation = rng.random()
+                if operation < 0.5:
+                    cache.set(key, key, rng.randint(0, 300), kind)
+                elif operation < 0.9:
+                    cache.get(key)
+                elif operation < 0.97:
+                    cache.discard(key)
+                else:
+                    cache.get_stale(key)
+                check_cache_invariants(cache)
+
+            stats = cache.stats()
+            assert stats["bytes"] == sum(kind["bytes"] for kind in stats["by_kind"].values())
+            assert stats["evictions"] == sum(kind["evictions"] for kind in stats["by_kind"].values())
+            cache.clear()
+            check_cache_invariants(cache)
+        print(f"✅ {policy}: invariantes correctos")
+
+    cache = ResponseCache(10, 1000, {}, 60, "lru", {"move": 100})
+    cache.set("grande", 1, 101, "move")
+    assert cache.get("grande") is None, "una entrada mayor que su presupuesto no debe guardarse"
+
+    try:
+        ResponseCache(10, 1000, {}, 60, "arc")
+        raise AssertionError("una política desconocida debe rechazarse")
+    except ValueError:
+        pass
+
+    try:
+        EvictionPolicy()
+        raise AssertionError("EvictionPolicy es abstracta")
+    except TypeError:
+        pass
+    print("✅ Presupuestos y validación correctos")
+    print()
+
+def check_sqlite_total(path: str) -> None:
+    """El total de bytes que llevan los triggers coincide con la suma real"""
+    conn = sqlite3.connect(path)
+    total, = conn.execute("SELECT total_size FROM cache_meta WHERE id = 0").fetchone()
+    real, = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+    conn.close()
+    assert total == real, (total, real)
+
+def test_sqlite_cache():
+    """Total de bytes mantenido por triggers, upsert y expulsión de la caché persistente"""
+    print("🧪 Probando la caché persistente en SQLite...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        cache = SQLiteCache(path, max_bytes=100)
+        now = time.time()
+        cache.set("a", {"v": "x" * 10}, now)
+        cache.set("b", {"v": "y" * 10}, now)
+        check_sqlite_total(path)
+        assert cache.stats()["entries"] == 2
+
+        # Sobrescribir una URL (upsert) actualiza el total, no lo duplica
+        cache.set("a", {"v": "x" * 30}, now)
+        check_sqlite_total(path)
+        assert cache.stats()["entries"] == 2
+        value, size, _, _ = cache.get("a", ttl=60)
+        assert value == {"v": "x" * 30} and size == len('{"v":"' + "x" * 30 + '"}')
+
+        # Superar el presupuesto expulsa las de acceso más antiguo
+        time.sleep(0.01)
+        cache.set("c", {"v": "z" * 60}, now)
+        stats = cache.stats()
+        check_sqlite_total(path)
+        assert stats["bytes"] <= 100 and stats["evictions"] >= 1, stats
+        assert cache.get("c", ttl=60) is not None
+
+        # Las escrituras de otro proceso (otra conexión) también se cuentan
+        other = SQLiteCache(path, max_bytes=100)
+        other.set("d", {"v": ""}, now)
+        check_sqlite_total(path)
+        assert cache.stats()["bytes"] == other.stats()["bytes"]
+        assert cache.get("d", ttl=60) is not None
+        other.close()
+        cache.close()
+
+        # Un fichero de una versión anterior (sin cache_meta) se cuenta al abrirlo
+        legacy_path = os.path.join(directory, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("CREATE TABLE responses (url TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL,"
+                     " fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        conn.execute("INSERT INTO responses VALUES ('viejo', '{}', 2, ?, ?)", (now, now))
+        conn.commit()
+        conn.close()
+        legacy = SQLiteCache(legacy_path, max_bytes=100)
+        assert legacy.stats()["bytes"] == 2
+        legacy.set("nuevo", [1, 2, 3], now)
+        assert legacy.stats()["bytes"] == 2 + len("[1,2,3]")
+        check_sqlite_total(legacy_path)
+        legacy.close()
+    print("✅ Total por triggers, upsert, expulsión y migración correctos")
+    print()
+
+def test_policy_behaviour():
+    """Cada política expulsa lo que debe"""
+    print("🧪 Probando el orden de expulsión...")
+
+    lru = EVICTION_POLICIES["lru"](capacity=100, max_entries=10)
+    for key in "abc":
+        lru.insert(key, 1)
+    lru.access("a")
+    assert lru.evict() == "b"
+    print("✅ LRU expulsa la clave usada hace más tiempo")
+
+    lfu = EVICTION_POLICIES["lfu"](capacity=100, max_entries=10)
+    for key in "abc":
+        lfu.insert(key, 1)
+    lfu.access("a")
+    lfu.access("a")
+    lfu.access("c")
+    assert lfu.evict() == "b"
+    assert lfu.evict() == "c"
+    print("✅ LFU expulsa la clave con menos accesos")
+
+    # Un recorrido de claves de un solo uso no debe desplazar a las frecuentes
+    def hit_rate(policy):
+        cache = ResponseCache(10 ** 6, 1000, {}, 60, policy)
+        hot = [f"h{i}" for i in range(50)]
+        rng = random.Random(1)
+        hits = 0
+        for step in range(20000):
+            key = rng.choice(hot) if rng.random() < 0.5 else f"scan{step}"
+            if cache.get(key) is not None:
+                hits += 1
+            else:
+                cache.set(key, 1, 10, "pokemon")
+        return hits / 20000
+
+    lru_rate, tinylfu_rate = hit_rate("lru"), hit_rate("tinylfu")
+    assert tinylfu_rate > lru_rate + 0.05, (lru_rate, tinylfu_rate)
+    print(f"✅ W-TinyLFU resiste recorridos: {tinylfu_rate:.2f} de aciertos frente a {lru_rate:.2f} con LRU")
+    print()
+
+def test_frequency_sketch():
+    """El sketch no subestima (antes de envejecer), se satura en 15 y envejece"""
+    print("🧪 Probando el sketch de frecuencias...")
+
+    sketch = FrequencySketch(1000)
+    counts = {}
+    rng = random.Random(3)
+    for _ in range(5000):
+        key = f"k{rng.randint(0, 300)}"
+        counts[key] = counts.get(key, 0) + 1
+        sketch.increment(key)
+    assert all(sketch.frequency(key) >= min(count, 15) for key, count in counts.items())
+    assert max(sketch.frequency(key) for key in counts) <= 15
+
+    sketch = FrequencySketch(16)
+    for _ in range(20):
+        sketch.increment("caliente")
+    for i in range(sketch._sample_size):
+        sketch.increment(f"frio{i}")
+    assert sketch.frequency("caliente") < 15, "los contadores deben reducirse a la mitad"
+    print("✅ Sketch correcto")
+    print()
+
+def test_retry_policy():
+    print("🧪 Probando la política de reintentos...")
+    policy = RetryPolicy(max_attempts=4, base_delay=0.1, max_delay=1.0)
+    for attempt in range(8):
+        for _ in range(100):
+            assert 0 <= policy.delay(attempt) <= min(1.0, 0.1 * 2 ** attempt)
+    assert policy.delay(0, retry_after=5) == 1.0
+    assert policy.delay(0, retry_after=0.3) == 0.3
+    assert RetryPolicy(0, 0.1, 1.0).max_attempts == 1
+    print("✅ Backoff con jitter y Retry-After acotados")
+    print()
+
+def test_circuit_breaker():
+    print("🧪 Probando el circuit breaker...")
+    breaker = CircuitBreaker(window=10, min_requests=4, failure_rate=0.5, cooldown=0.05)
+    for success in (True, False, True):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED, "no se abre antes de min_requests"
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow(), "tras el cooldown deja pasar una prueba"
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow(), "solo una prueba a la vez"
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["window_requests"] == 0
+    print("✅ Transiciones cerrado / abierto / semiabierto correctas")
+    print()
+
+def test_hedging_policy():
+    print("🧪 Probando las peticiones de cobertura...")
+    hedging = HedgingPolicy(percentile=90, budget=0.1)
+    for i in range(HedgingPolicy.MIN_SAMPLES - 1):
+        hedging.record(i / 100)
+    assert hedging.delay() is None, "sin datos suficientes no se cubre"
+    for i in range(HedgingPolicy.MIN_SAMPLES - 1, 100):
+        hedging.record(i / 100)
+    assert abs(hedging.delay() - 0.89) < 0.011
+
+    hedges = 0
+    for _ in range(1000):
+        hedging.start()
+        if hedging.try_hedge():
+            hedges += 1
+    assert hedges <= 1000 * 0.1, "no se supera el presupuesto de coberturas"
+    assert hedges == hedging.hedged and hedging.over_budget == 1000 - hedges
+    print(f"✅ Retardo por percentil y presupuesto respetado ({hedges} coberturas de 1000)")
+    print()
+
+async def test_concurrency_limiter():
+    print("🧪 Probando la concurrencia adaptativa...")
+    limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=16, latency_tolerance=2.0)
+
+    await limiter.acquire()
+    limiter.release(None, overloaded=False)
+    assert limiter.increases == 0 and limiter.decreases == 0, "una cancelación no ajusta el límite"
+
+    await limiter.acquire()
+    limiter.release(0.01, overloaded=False)
+    assert limiter.increases == 1
+
+    await limiter.acquire()
+    limiter.release(0.01, overloaded=True)
+    assert limiter.decreases == 1 and int(limiter.limit) == 2
+
+    # Los que esperan entran cuando se libera un hueco, también tras una cancelación
+    limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=16, latency_tolerance=2.0)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 1
+    limiter.release(None, overloaded=False)
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.in_flight == 1
+
+    # Un waiter cancelado no deja el hueco ocupado
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    limiter.release(0.01, overloaded=False)
+    assert limiter.in_flight == 0 and limiter.stats()["queued"] == 0
+    print("✅ Ajuste AIMD, cola y cancelaciones correctos")
+
+    # Latencias estables pero distintas por tipo (/move rápido, /pokemon lento):
+    # no son congestión, así que el límite debe crecer hacia el máximo
+    limiter = AdaptiveConcurrencyLimiter(initial=10, minimum=2, maximum=64, latency_tolerance=2.0)
+    for round_number in range(300):
+        slots = int(limiter.limit)
+        for slot in range(slots):
+            await limiter.acquire()
+        for slot in range(slots):
+            kind, latency = ("move", 0.04) if slot % 2 else ("pokemon", 0.15)
+            limiter.release(latency, overloaded=False, kind=kind)
+    assert limiter.decreases == 0, limiter.stats()
+    assert int(limiter.limit) == 64, limiter.stats()
+    print(f"✅ Latencias mixtas por tipo: el límite sube de 10 a {int(limiter.limit)} sin reducciones")
+    print()
+
+def test_stats_store():
+    print("🧪 Probando el almacén de estadísticas...")
+    store = StatsStore(
+        [25, 1, 150, 10],
+        ["pikachu", "bulbasaur", "mewtwo", "caterpie"],
+        [
+            [35, 55, 40, 50, 50, 90],
+            [45, 49, 49, 65, 65, 45],
+            [106, 110, 90, 154, 90, 130],
+            [45, 30, 35, 20, 20, 45],
+        ],
+    )
+    assert len(store) == 4
+    assert store.row_of("25") == store.row_of("Pikachu") == 0
+    assert store.row_of("999") is None and store.row_of("nope") is None
+    assert store.record(2)["total"] == 680
+
+    # Empates en speed (bulbasaur y caterpie con 45): se ordenan por ID
+    assert [store.ids[row] for row in store.top("speed", 3)] == [150, 25, 1]
+    assert [store.ids[row] for row in store.top("Speed", 2, ascending=True)] == [1, 10]
+    assert [store.ids[row] for row in store.top("total", 10)] == [150, 25, 1, 10]
+    assert store.top("hp", 0) == []
+
+    percentiles = store.percentiles(store.row_of("mewtwo"))
+    assert percentiles["total"] == 87.5, percentiles
+    assert store.percentiles(store.row_of("caterpie"))["special_attack"] == 12.5
+
+    assert [store.ids[row] for row in store.filter({"speed": 45}, {})] == [1, 10, 25, 150]
+    assert [store.ids[row] for row in store.filter({"special-attack": 50}, {"total": 400})] == [1, 25]
+    try:
+        store.filter({"luck": 1}, {})
+        raise AssertionError("una estadística desconocida debe rechazarse")
+    except ValueError:
+        pass
+    print("✅ Top-N, percentiles y filtros correctos")
+    print()
+
+def test_learnset_index():
+    print("🧪 Probando el índice de aprendizajes...")
+    index = LearnsetIndex([
+        ("pikachu", 25, [
+            ("thunder-shock", "red-blue", "level-up", 1),
+            ("thunder-shock", "gold-silver", "level-up", 5),
+            ("thunderbolt", "red-blue", "machine", 0),
+            ("quick-attack", "gold-silver", "level-up", 16),
+        ]),
+        ("raichu", 26, [
+            ("thunderbolt", "gold-silver", "machine", 0),
+            ("thunder-shock", "red-blue", "level-up", 1),
+        ]),
+        ("pikachu-alola-cap", 10094, [("thunderbolt", "red-blue", "level-up", 30)]),
+        ("ditto", 132, []),
+    ])
+    assert len(index) == 7
+    pikachu = index.pokemon_code("Pikachu")
+    assert index.pokemon_code("26") == 1 and index.pokemon_code("mew") is None
+
+    assert index.learnset(pikachu) == [
+        ("thunder-shock", [("red-blue", "level-up", 1), ("gold-silver", "level-up", 5)]),
+        ("thunderbolt", [("red-blue", "machine", 0)]),
+        ("quick-attack", [("gold-silver", "level-up", 16)]),
+    ]
+    assert index.learnset(index.pokemon_code("ditto")) == []
+
+    assert index.moves_by_level(pikachu, 10) == [{"name": "Thunder Shock", "level_learned": 1}]
+    assert index.moves_by_level(pikachu, 20, "gold-silver") == [
+        {"name": "Thunder Shock", "level_learned": 5},
+        {"name": "Quick Attack", "level_learned": 16},
+    ]
+    assert index.moves_by_level(pikachu, 100, "black-white") == []
+
+    # Ordenados por ID; métodos sin repetir y nivel mínimo solo por level-up
+    assert index.pokemon_learning("thunderbolt") == [
+        {"id": 25, "name": "Pikachu", "learn_methods": ["machine"], "min_level": None},
+        {"id": 26, "name": "Raichu", "learn_methods": ["machine"], "min_level": None},
+        {"id": 10094, "name": "Pikachu-Alola-Cap", "learn_methods": ["level-up"], "min_level": 30},
+    ]
+    assert index.pokemon_learning("thunder-shock") == [
+        {"id": 25, "name": "Pikachu", "learn_methods": ["level-up"], "min_level": 1},
+        {"id": 26, "name": "Raichu", "learn_methods": ["level-up"], "min_level": 1},
+    ]
+    assert [pokemon["id"] for pokemon in index.pokemon_learning("thunderbolt", "red-blue", "machine")] == [25]
+    assert index.pokemon_learning("thunderbolt", "black-white") == []
+    assert index.pokemon_learning("surf") == []
+    print("✅ Aprendizajes, movimientos por nivel y búsqueda inversa correctos")
+    print()
+
+def test_name_index():
+    print("🧪 Probando el índice de nombres...")
+    index = NameIndex(
+        {"pikachu": 25, "mr-mime": 122, "deoxys-normal": 386, "deoxys-attack": 10001,
+         "raichu": 26, "raichu-alola": 10100, "nidoran-f": 29, "flabebe": 669},
+        {"pikachu": 25, "mr-mime": 122, "deoxys": 386, "raichu": 26, "nidoran-f": 29, "flabebe": 669},
+    )
+    assert NameIndex.normalize(" Mr. Mime ") == "mr-mime"
+    assert NameIndex.normalize("Flabébé") == "flabebe"
+    assert NameIndex.normalize("Nidoran♀") == "nidoran-f"
+
+    assert index.resolve("Mr. Mime") == "mr-mime"
+    assert index.resolve("25") == "pikachu" and index.resolve("9999") is None
+    assert index.resolve("deoxys") == "deoxys-normal", "una especie usa su variedad por defecto"
+    assert index.resolve("pikachuu") is None
+
+    assert index.resolve("raichu-alola", "pokemon-species") == "raichu", "una forma pertenece a su especie"
+    assert index.resolve("deoxys-attack", "pokemon-species") == "deoxys"
+    assert index.resolve("386", "pokemon-species") == "deoxys"
+    assert index.species_id_of(10100) == 26 and index.species_id_of(25) == 25
+
+    assert index.prefix("rai") == ["raichu", "raichu-alola"]
+    assert index.suggest("pikachuu")[0] == "pikachu"
+    assert index.suggest("deox", limit=2) == ["deoxys", "deoxys-attack"]
+    assert index.suggest("") == []
+    print("✅ Normalización, resolución de formas y sugerencias correctas")
+    print()
+
+def test_field_selection():
+    print("🧪 Probando la selección de campos...")
+    assert _parse_fields(None, POKEMON_FIELDS) is None
+    assert _parse_fields([], POKEMON_FIELDS) is None
+    assert _parse_fields("name, ID", POKEMON_FIELDS) == {"name": None, "id": None}
+    assert _parse_fields(["stats.speed", "stats.special-attack"], POKEMON_FIELDS, POKEMON_SUBFIELDS) == {
+        "stats": ("speed", "special_attack")
+    }
+    # El campo completo gana a sus subcampos, en cualquier orden
+    assert _parse_fields(["stats", "stats.hp"], POKEMON_FIELDS, POKEMON_SUBFIELDS) == {"stats": None}
+    assert _parse_fields(["stats.hp", "stats"], POKEMON_FIELDS, POKEMON_SUBFIELDS) == {"stats": None}
+    for invalid in (["color"], ["stats.luck"], ["name.first"]):
+        try:
+            _parse_fields(invalid, POKEMON_FIELDS, POKEMON_SUBFIELDS)
+            raise AssertionError(f"{invalid} debe rechazarse")
+        except ValueError:
+            pass
+
+    record = PokemonRecord.from_payload({
+        "id": 25, "name": "pikachu", "height": 4, "weight": 60, "base_experience": 112,
+        "types": [{"type": {"name": "electric"}}],
+        "abilities": [{"ability": {"name": "static"}}, {"ability": {"name": "lightning-rod"}}],
+        "stats": [{"stat": {"name": name}, "base_stat": value} for name, value in (
+            ("hp", 35), ("attack", 55), ("defense", 40), ("special-attack", 50), ("special-defense", 50), ("speed", 90)
+        )],
+        "sprites": {"front_default": "front.png", "back_default": None},
+    })
+    full = record.to_dict()
+    assert full["name"] == "Pikachu" and full["height"] == 0.4 and full["weight"] == 6.0
+    assert full["stats"]["special_attack"] == 50 and full["sprites"]["front_default"] == "front.png"
+
+    selection = _parse_fields(["weight", "stats.speed", "sprites.front_default", "name"],
+                              POKEMON_FIELDS, POKEMON_SUBFIELDS)
+    partial = record.to_dict(selection)
+    assert list(partial) == ["weight", "stats", "sprites", "name"], "en el orden en que se pidieron"
+    assert partial == {"weight": 6.0, "stats": {"speed": 90}, "sprites": {"front_default": "front.png"},
+                       "name": "Pikachu"}
+    assert all(partial[field] == full[field] for field in ("weight", "name"))
+    print("✅ Campos, subcampos y registros parciales correctos")
+    print()
+
+async def main():
+    print("🚀 Pruebas internas del servidor MCP de Pokémon")
+    print("=" * 50)
+    test_cache_fuzz()
+    test_sqlite_cache()
+    test_policy_behaviour()
+    test_frequency_sketch()
+    test_retry_policy()
+    test_circuit_breaker()
+    test_hedging_policy()
+    await test_concurrency_limiter()
+    test_stats_store()
+    test_learnset_index()
+    test_name_index()
+    test_field_selection()
+    print("🎉 Todas las pruebas internas pasaron")
+
+if __name__ == "__main__":
+    asyncio.run(main())